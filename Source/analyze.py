@@ -0,0 +1,122 @@
+import contextlib
+import io
+import math
+import sys
+from collections import Counter
+
+from noteEvents import ReleaseEvent, TempoEvent
+
+
+# Dry run: predicts the workshop arrays and line count of a song from the
+# cleaned MidiFile.notes, without running processFile/parseInfo/createOW or
+# writing any output. Songs those would crash on are flagged instead of
+# reported as fitting.
+#   python Source/analyze.py mids/*.mid
+
+ARRAY_LIMIT = 1000
+LINE_LIMIT = 10000
+RULE_LINES = 12
+
+def predict(notes):
+    # parseInfo walks the first len(rows)-1-tempos rows (tempo rows after the first are popped)
+    tempos = sum(1 for e in notes[1:] if isinstance(e,TempoEvent))
+    walked = notes[:len(notes)-1-tempos]
+    chords = [len(e.key) for e in walked if not isinstance(e,(TempoEvent,ReleaseEvent))]
+    n = len(chords)
+
+    #Press times in seconds through the tempo map (120 bpm until the first tempo event)
+    spb = 0.5
+    sec = 0.0
+    last = 0.0
+    first = None
+    end = 0.0
+    for e in walked:
+        sec += (e.time-last)*spb
+        last = e.time
+        if isinstance(e,TempoEvent):
+            spb = 60/e.bpm
+        elif not isinstance(e,ReleaseEvent):
+            if first is None:
+                first = sec
+            end = sec
+    duration = end - (first or 0.0)
+
+    info = workshopSizes(chords)
+    info["seconds"] = duration
+    info["notesPerSecond"] = n/duration if duration > 0 else 0.0
+    info["chordSizes"] = dict(sorted(Counter(chords).items()))
+    info["errors"] = convertErrors(notes)
+    return info
+
+def convertErrors(notes):
+    # Songs processFile/parseInfo crash on: the first tempo is read from the first row, and
+    # parseInfo needs two rows behind every later tempo row it pops
+    if not notes:
+        return ["no notes"]
+    errors = []
+    if not isinstance(notes[0],TempoEvent):
+        errors.append("no leading tempo")
+    if any(isinstance(e,TempoEvent) for e in notes[max(1,len(notes)-2):]):
+        errors.append("trailing tempo row")
+    return errors
+
+def workshopSizes(chords):
+    # chords holds the size of every chord in song order
+    n = len(chords)
+    # SONG PART x only emits y = 1..99, so every 100th chord never reaches timeQ
+    emitted = [c for k,c in enumerate(chords) if k % 100 != 99]
+    posQ = sum(min(c,6) for c in emitted)
+    songLines = RULE_LINES*math.ceil(n/100) + 2*len(emitted) + posQ
+    enemLines = RULE_LINES*(n//100 + 1) + 2*n + 1
+    return {
+        "timeQ": len(emitted),
+        "posQ": posQ,
+        "notes": len(emitted),
+        "enemTime": n,
+        "enemPos": n,
+        "songLines": songLines,
+        "enemLines": enemLines,
+        "lines": songLines + enemLines,
+    }
+
+def overLimits(info):
+    over = [k for k in ("timeQ","posQ","notes","enemTime","enemPos") if info[k] > ARRAY_LIMIT]
+    if info["lines"] > LINE_LIMIT:
+        over.append("lines")
+    return over
+
+def printReport(name,info):
+    print("\n" + name)
+    print("  timeQ %d  posQ %d  notes %d  enemTime %d  enemPos %d" % (info["timeQ"],info["posQ"],info["notes"],info["enemTime"],info["enemPos"]))
+    print("  workshop lines %d (song %d, enemies %d)" % (info["lines"],info["songLines"],info["enemLines"]))
+    print("  %.1f s, %.2f notes per second" % (info["seconds"],info["notesPerSecond"]))
+    print("  chord sizes " + "  ".join("%d:%d" % kv for kv in info["chordSizes"].items()))
+    over = overLimits(info)
+    if info["errors"]:
+        print("  CAN'T CONVERT: " + ", ".join(info["errors"]))
+    if over:
+        print("  OVER LIMIT: " + ", ".join(over))
+    elif not info["errors"]:
+        print("  fits (arrays <= %d, lines <= %d)" % (ARRAY_LIMIT,LINE_LIMIT))
+    return
+
+def main():
+    from getSongNotes import MidiFile
+    if len(sys.argv) < 2:
+        print("usage: analyze.py <file.mid> [file.mid ...]")
+        return 1
+    print("%-60s %6s %6s %6s %7s %6s %s" % ("file","timeQ","posQ","enem","lines","nps","fits"))
+    for path in sys.argv[1:]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            midi = MidiFile(path,midi_dir="")
+        if not midi.success or not midi.notes:
+            print("%-60s could not be parsed" % path)
+            continue
+        info = predict(midi.notes)
+        over = info["errors"] + overLimits(info)
+        print("%-60s %6d %6d %6d %7d %6.2f %s" % (path,info["timeQ"],info["posQ"],info["enemTime"],info["lines"],
+                                                 info["notesPerSecond"],"no (" + ",".join(over) + ")" if over else "yes"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
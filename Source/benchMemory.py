@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from golden import CORPUS, ROOT, exportSource
+
+
+# Memory a MidiFile keeps after parsing, per row of MidiFile.notes, for every
+# MIDI in mids/ and trebleMids/. The parse runs in a child process under
+# tracemalloc, once with the getSongNotes of --baseline (the original
+# [time, "string"] lists by default) and once with the one of --source, so
+# everything the object holds (notes, events, the file bytes, logs) counts.
+#   python Source/benchMemory.py [--baseline d62bd36] [--source path/to/Source]
+
+# Parses the files named on the command line with the getSongNotes of argv[1] and prints
+# {name: [rows, bytes kept]}. The original scripts import keyboard, an empty module stands in
+MEASURE = ("import contextlib,io,json,os,sys,tracemalloc,types\n"
+           "sys.path.insert(0,sys.argv[1])\n"
+           "try:\n"
+           "    import keyboard\n"
+           "except ImportError:\n"
+           "    sys.modules['keyboard'] = types.ModuleType('keyboard')\n"
+           "with contextlib.redirect_stdout(io.StringIO()):\n"
+           "    import getSongNotes\n"
+           "out = {}\n"
+           "for name in sys.argv[2:]:\n"
+           "    tracemalloc.start()\n"
+           "    with contextlib.redirect_stdout(io.StringIO()):\n"
+           "        midi = getSongNotes.MidiFile(name)\n"
+           "    out[name] = [len(midi.notes),tracemalloc.get_traced_memory()[0]]\n"
+           "    tracemalloc.stop()\n"
+           "    del midi\n"
+           "print(json.dumps(out))\n")
+
+def measure(source,midi_dir,names):
+    # Both versions read mids/<name> from the working folder, so it links mids to midi_dir
+    work = tempfile.mkdtemp(prefix="bench-")
+    try:
+        try:
+            os.symlink(os.path.join(ROOT,midi_dir),os.path.join(work,"mids"))
+        except OSError:
+            shutil.copytree(os.path.join(ROOT,midi_dir),os.path.join(work,"mids"))
+        result = subprocess.run([sys.executable,"-c",MEASURE,source] + names,cwd=work,stdin=subprocess.DEVNULL,
+                                capture_output=True,text=True,check=True)
+        return json.loads(result.stdout.splitlines()[-1])
+    finally:
+        shutil.rmtree(work,ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline",default="d62bd36",metavar="COMMIT",help="commit whose MidiFile is the before column")
+    parser.add_argument("--source",default=os.path.dirname(os.path.abspath(__file__)),help="Source folder of the after column")
+    args = parser.parse_args()
+
+    old = tempfile.mkdtemp(prefix="bench-src-")
+    try:
+        exportSource(args.baseline,old)
+        total = [0,0,0]
+        print("%-65s %7s %10s %10s" % ("file","rows","before B/r","after B/r"))
+        for _,midi_dir,_ in CORPUS:
+            names = sorted(n for n in os.listdir(os.path.join(ROOT,midi_dir)) if n.lower().endswith(".mid"))
+            before = measure(old,midi_dir,names)
+            after = measure(os.path.abspath(args.source),midi_dir,names)
+            for name in names:
+                rows = after[name][0]
+                if not rows or before[name][0] != rows:
+                    print("%-65s %7d %10s %10s" % (midi_dir + "/" + name,rows,"-","-"))
+                    continue
+                total[0] += rows
+                total[1] += before[name][1]
+                total[2] += after[name][1]
+                print("%-65s %7d %10.1f %10.1f" % (midi_dir + "/" + name,rows,before[name][1]/rows,after[name][1]/rows))
+    finally:
+        shutil.rmtree(old,ignore_errors=True)
+    print("%-65s %7d %10.1f %10.1f" % ("total",total[0],total[1]/total[0],total[2]/total[0]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
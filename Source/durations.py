@@ -0,0 +1,59 @@
+from noteColumns import np
+
+
+# Note duration pairing. One pass over the time ordered NoteColumns with a
+# stack of open note-ons per key: a release (note-off or velocity 0 note-on)
+# closes the most recent open note of its key, a re-trigger of a key that is
+# still held just stacks a second note, releases with nothing open are
+# ignored and notes never released last until the final event.
+
+def pairDurations(columns):
+    # Duration in beats of every onset row of columns, 0 on release rows
+    times = columns.times
+    keys = columns.keys
+    velocities = columns.velocities
+    if np is not None:
+        times = times.tolist()
+        keys = keys.tolist()
+        velocities = velocities.tolist()
+    n = len(times)
+    durations = [0.0] * n
+    held = {}
+    for i in range(n):
+        if velocities[i] > 0:
+            stack = held.get(keys[i])
+            if stack is None:
+                held[keys[i]] = [i]
+            else:
+                stack.append(i)
+        else:
+            stack = held.get(keys[i])
+            if stack:
+                j = stack.pop()
+                durations[j] = times[i] - times[j]
+    end = times[-1] if n else 0.0
+    for stack in held.values():
+        for j in stack:
+            durations[j] = end - times[j]
+    if np is not None:
+        return np.array(durations)
+    return durations
+
+def holdsByTime(columns):
+    # {onset beat: longest duration in seconds of the notes starting there}
+    durations = pairDurations(columns)
+    onsets = [i for i in range(len(columns)) if columns.velocities[i] > 0]
+    starts = [columns.times[i] for i in onsets]
+    ends = [columns.times[i] + durations[i] for i in onsets]
+    seconds = columns.seconds(starts + ends)
+    if np is not None:
+        seconds = seconds.tolist()
+    holds = {}
+    for k in range(len(onsets)):
+        t = float(starts[k])
+        hold = seconds[len(onsets)+k] - seconds[k]
+        if hold > holds.get(t,0.0):
+            holds[t] = hold
+        else:
+            holds.setdefault(t,hold)
+    return holds
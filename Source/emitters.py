@@ -0,0 +1,237 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from noteEvents import ReleaseEvent, TempoEvent
+from workshopWriter import (ENEM_HOLD_LINE, ENEM_POS_LINE, ENEM_TIME_LINE, HOLD_LINE, NOTES_LINE, NUM_ENEMS_LINE,
+                            POS_LINES, RULE_HEAD, RULE_TAIL, TIME_LINE, tempNear, writeAtomic)
+
+
+# Fan-out output. fanOut walks MidiFile.notes once and hands every event to
+# each emitter, plus the chords parseInfo would keep (time in seconds since
+# the previous chord, see walk) to the ones that set wantsOw. Every emitter writes to
+# its own buffer and the buffers are saved on a thread pool at the end, so
+# one more output is one more cheap callback per event. With stream=True an
+# emitter writes straight to a temp file instead (renamed over path by save),
+# for songs too large to keep in memory.
+
+
+class Emitter:
+    wantsOw = False
+
+    def __init__(self,path,stream=False):
+        self.path = path
+        self.tmp = None
+        if stream:
+            fd,self.tmp = tempNear(path)
+            self.out = os.fdopen(fd,"w")
+        else:
+            self.out = io.StringIO()
+        self.write = self.out.write
+
+    def note(self,e):
+        pass
+
+    def owNote(self,seconds,chord,beat):
+        pass
+
+    def finish(self):
+        pass
+
+    def save(self):
+        if self.tmp is None:
+            writeAtomic(self.path,self.out.getvalue())
+        else:
+            self.out.close()
+            os.replace(self.tmp,self.path)
+
+    def discard(self):
+        if self.tmp is not None:
+            self.out.close()
+            os.unlink(self.tmp)
+
+
+class SongText(Emitter):
+    # song.txt, the legacy text song file
+
+    def __init__(self,path="song.txt",playback_speed=1.0,stream=False):
+        Emitter.__init__(self,path,stream)
+        self.write("playback_speed=" + str(playback_speed) + "\n")
+
+    def note(self,e):
+        self.write(str(e.time) + " " + e.text() + "\n")
+
+
+class Sheet(Emitter):
+    # Virtual piano sheet, same layout as MidiFile.save_sheet
+
+    def __init__(self,path="sheet.txt",stream=False):
+        Emitter.__init__(self,path,stream)
+        self.count = 0
+
+    def note(self,e):
+        if isinstance(e,(TempoEvent,ReleaseEvent)):
+            return
+        notes = e.text()
+        self.write("%7s " % ("[" + notes + "]" if len(notes) > 1 else notes))
+        self.count += 1
+        if self.count % 8 == 0:
+            self.write("\n")
+
+
+class WorkshopSong(Emitter):
+    # OW-Song.txt, the SONG PART rules of workshopWriter.renderSong written as the chords arrive
+    wantsOw = True
+
+    def __init__(self,path="OW-Song.txt",holdAt=None,stream=False):
+        Emitter.__init__(self,path,stream)
+        self.holdAt = holdAt
+        self.count = 0
+
+    def owNote(self,seconds,chord,beat):
+        i = self.count
+        self.count += 1
+        if i % 100 == 0:
+            if i:
+                self.write(RULE_TAIL)
+            self.write(RULE_HEAD % ("SONG PART",i // 100 + 1))
+        if i % 100 == 99:
+            return
+        self.write(TIME_LINE % seconds)
+        for c in chord[:6]:
+            self.write(POS_LINES[c])
+        self.write(NOTES_LINE % len(chord))
+        if self.holdAt is not None:
+            self.write(HOLD_LINE % self.holdAt.get(beat,0.0))
+
+    def finish(self):
+        if self.count:
+            self.write(RULE_TAIL)
+
+
+class WorkshopEnemies(Emitter):
+    # OW-Enem.txt, the ENEMY PART rules of workshopWriter.renderEnemies,
+    # position(seconds, last) places each enemy (last is -1 for the first)
+    wantsOw = True
+
+    def __init__(self,position,path="OW-Enem.txt",holdAt=None,stream=False):
+        Emitter.__init__(self,path,stream)
+        self.position = position
+        self.holdAt = holdAt
+        self.last = -1
+        self.count = 0
+
+    def owNote(self,seconds,chord,beat):
+        i = self.count
+        self.count += 1
+        if i % 100 == 0:
+            if i:
+                self.write(RULE_TAIL)
+            self.write(RULE_HEAD % ("ENEMY PART",i // 100))
+        if i % 100 == 99 or i % 100 == 49:
+            self.write(ENEM_TIME_LINE % (float(seconds) - 0.033))
+        else:
+            self.write(ENEM_TIME_LINE % seconds)
+        self.last = self.position(seconds,self.last)
+        self.write(ENEM_POS_LINE % self.last)
+        if self.holdAt is not None:
+            self.write(ENEM_HOLD_LINE % self.holdAt.get(beat,0.0))
+
+    def finish(self):
+        n = self.count
+        if n % 100 == 0:
+            if n:
+                self.write(RULE_TAIL)
+            self.write(RULE_HEAD % ("ENEMY PART",n // 100))
+        self.write(NUM_ENEMS_LINE % n)
+        self.write(RULE_TAIL)
+
+
+class Json(Emitter):
+    # {"playback_speed", "events": [[beat, text]...], "chords": [[seconds, chord, beat]...]}
+    wantsOw = True
+
+    def __init__(self,path="song.json",playback_speed=1.0,stream=False):
+        Emitter.__init__(self,path,stream)
+        self.chords = tempfile.TemporaryFile("w+") if stream else io.StringIO()
+        self.write('{"playback_speed": %s, "events": [' % json.dumps(playback_speed))
+        self.sep = ""
+        self.chordSep = ""
+        self.quoted = {}
+
+    def quote(self,text):
+        # Songs repeat the same few texts, encode each once
+        q = self.quoted.get(text)
+        if q is None:
+            q = self.quoted[text] = json.dumps(text)
+        return q
+
+    def note(self,e):
+        # repr of a float is its JSON form
+        self.write("%s[%r, %s]" % (self.sep,float(e.time),self.quote(e.text())))
+        self.sep = ", "
+
+    def owNote(self,seconds,chord,beat):
+        self.chords.write("%s[%r, %s, %r]" % (self.chordSep,float(seconds),self.quote(chord),float(beat)))
+        self.chordSep = ", "
+
+    def finish(self):
+        self.write('], "chords": [')
+        self.chords.seek(0)
+        shutil.copyfileobj(self.chords,self.out)
+        self.chords.close()
+        self.write("]}\n")
+
+
+def walk(notes):
+    # Yields (event, chord) for every event of notes (which must start with the song's tempo),
+    # chord is the (seconds, text, beat) row parseInfo reads at that point or None.
+    # parseInfo reads one row behind its tempo scan plus one per tempo row it popped,
+    # lag holds the rows it has passed but not read yet
+    lag = deque()
+    tempo = None
+    prevTime = 0
+    for e in notes:
+        chord = None
+        if tempo is None:
+            if not isinstance(e,TempoEvent):
+                raise ValueError("song does not start with a tempo")
+            tempo = 60/float(e.bpm)
+        elif isinstance(e,TempoEvent):
+            tempo = 60/float(e.bpm)
+        else:
+            row = lag.popleft()
+            if not isinstance(row,(TempoEvent,ReleaseEvent)):
+                chord = ((row.time - prevTime) * tempo,row.text(),row.time)
+                prevTime = row.time
+        lag.append(e)
+        yield e,chord
+
+def workshopParts(emitters):
+    # Paths of the SONG PART / ENEMY PART outputs, the parts --template splices in
+    return [em.path for em in emitters if isinstance(em,(WorkshopSong,WorkshopEnemies))]
+
+def fanOut(notes,emitters,workers=4):
+    noters = [em.note for em in emitters if type(em).note is not Emitter.note]
+    owNoters = [em.owNote for em in emitters if em.wantsOw]
+    try:
+        for e,chord in walk(notes):
+            for f in noters:
+                f(e)
+            if chord is not None:
+                for f in owNoters:
+                    f(*chord)
+    except BaseException:
+        for em in emitters:
+            em.discard()
+        raise
+    for em in emitters:
+        em.finish()
+        print("Saving",type(em).__name__,"to",em.path)
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(lambda em: em.save(),emitters))
+    return
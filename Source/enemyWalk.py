@@ -0,0 +1,115 @@
+import random
+
+
+# Runtime enemy positions. Instead of one enemPos Vector literal per enemy,
+# getBots --runtime-positions writes a seed and the ENEMY POSITIONS rule,
+# which replays the getPosition style random walk in game from enemTime.
+# walkPositions is the Python reference of that rule, both sides draw from
+# the same LCG so they produce the same sequence (tests/test_enemyWalk.py
+# runs the rule text against it and checks its bounds and step sizes).
+# Every LCG value stays below 2^24, so the arithmetic is exact whatever
+# float width the workshop uses.
+
+LCG_A = 221
+LCG_C = 1
+LCG_M = 65536
+
+# (axis, spawn range, step range, walk limits, direction when the coin is heads)
+AXES = (
+    ("X",(-95.5,-85.5),(2,4),(-96,-85),-1),
+    ("Y",(10.7,14.0),(0.5,1.5),(10,14),1),
+    ("Z",(-46.12,-35.12),(2,4),(-46,-35),-1),
+)
+# Enemies further apart than this many seconds respawn anywhere in the arena
+RESET_TIME = 0.6
+
+
+class Lcg:
+
+    def __init__(self,seed):
+        self.state = seed % LCG_M
+
+    def next(self):
+        self.state = (self.state * LCG_A + LCG_C) % LCG_M
+        return self.state
+
+def newSeed():
+    return random.randrange(LCG_M)
+
+def enemyTimes(owTimes):
+    # enemTime exactly as renderEnemies writes it (%2.4f, 0.033 s earlier on every 50th)
+    times = []
+    for i in range(len(owTimes)):
+        t = owTimes[i]
+        if i % 100 == 99 or i % 100 == 49:
+            t = float(t) - 0.033
+        times.append(float("%2.4f" % t))
+    return times
+
+def span(r):
+    # hi - lo rounded the way the rule text writes it
+    return round(r[1] - r[0],4)
+
+def walkPositions(times,seed):
+    rng = Lcg(seed)
+    pos = [0.0,0.0,0.0]
+    out = []
+    for i in range(len(times)):
+        t = times[i]
+        if i == 0 or t > RESET_TIME:
+            for a,(name,spawn,step,limit,heads) in enumerate(AXES):
+                pos[a] = spawn[0] + span(spawn) * rng.next() / LCG_M
+        else:
+            for a,(name,spawn,step,limit,heads) in enumerate(AXES):
+                last = pos[a]
+                dir = heads if rng.next() >= LCG_M // 2 else -heads
+                pos[a] = last + dir * (step[0] + span(step) * rng.next() / LCG_M) * t * 2
+                if (dir < 0 and pos[a] < limit[0]) or (dir > 0 and pos[a] > limit[1]):
+                    pos[a] = last - dir * (step[0] + span(step) * rng.next() / LCG_M) * t * 2
+        out.append(tuple(pos))
+    return out
+
+def _draw():
+    return "Global.enemSeed = (Global.enemSeed * %d + %d) %% %d;" % (LCG_A,LCG_C,LCG_M)
+
+def _uniform(r):
+    return "(%r + %r * Global.enemSeed / %d)" % (r[0],span(r),LCG_M)
+
+def renderWalkRule(seed):
+    body = [
+        "Wait(0.016, Ignore Condition);",
+        "Global.enemSeed = %d;" % (seed % LCG_M),
+        "For Global Variable(enemI, 0, Count Of(Global.enemTime), 1);",
+        "\tGlobal.enemT = Global.enemTime[Global.enemI];",
+        "\tIf(Global.enemI == 0 || Global.enemT > %r);" % RESET_TIME,
+    ]
+    for name,spawn,step,limit,heads in AXES:
+        body += ["\t\t" + _draw(),
+                 "\t\tGlobal.enem%s = %s;" % (name,_uniform(spawn))]
+    body.append("\tElse;")
+    for name,spawn,step,limit,heads in AXES:
+        body += [
+            "\t\tGlobal.enemL = Global.enem%s;" % name,
+            "\t\t" + _draw(),
+            "\t\tIf(Global.enemSeed >= %d);" % (LCG_M // 2),
+            "\t\t\tGlobal.enemDir = %d;" % heads,
+            "\t\tElse;",
+            "\t\t\tGlobal.enemDir = %d;" % -heads,
+            "\t\tEnd;",
+            "\t\t" + _draw(),
+            "\t\tGlobal.enem%s = Global.enemL + Global.enemDir * %s * Global.enemT * 2;" % (name,_uniform(step)),
+            "\t\tIf((Global.enemDir < 0 && Global.enem%s < %r) || (Global.enemDir > 0 && Global.enem%s > %r));" % (name,limit[0],name,limit[1]),
+            "\t\t\t" + _draw(),
+            "\t\t\tGlobal.enem%s = Global.enemL - Global.enemDir * %s * Global.enemT * 2;" % (name,_uniform(step)),
+            "\t\tEnd;",
+        ]
+    body += [
+        "\tEnd;",
+        "\tModify Global Variable(enemPos, Append To Array, Vector(Global.enemX, Global.enemY, Global.enemZ));",
+        "\tIf(Global.enemI % 50 == 49);",
+        "\t\tWait(0.016, Ignore Condition);",
+        "\tEnd;",
+        "End;",
+    ]
+    return ("rule(\"ENEMY POSITIONS\")\n{\n\tevent\n\t{\n\t\tOngoing - Global;\n\t}\n\n\tactions\n\t{\n"
+            + "".join("\t\t" + line + "\n" for line in body) + "\t}\n}\n\n")
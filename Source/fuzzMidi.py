@@ -0,0 +1,132 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from safeMidi import Limits, MidiError, decode
+
+
+# Fuzz harness for safeMidi.decode. Mutates the MIDI files of mids/ and
+# trebleMids/ (flipped and inserted bytes, truncation, huge lengths, endless
+# variable lengths) and adds a few hand built worst cases, then checks that
+# every input either decodes or raises MidiError and reports the slowest and
+# most memory hungry cases.
+#
+#   python Source/fuzzMidi.py [--cases 500] [--seed 1]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def header(tracks=1,division=480):
+    return b"MThd" + (6).to_bytes(4,"big") + (1).to_bytes(2,"big") + tracks.to_bytes(2,"big") + division.to_bytes(2,"big")
+
+def varLen(n):
+    out = [n & 0x7F]
+    n >>= 7
+    while n:
+        out.append(0x80 | (n & 0x7F))
+        n >>= 7
+    return bytes(reversed(out))
+
+def chunk(name,body,length=None):
+    return name + (len(body) if length is None else length).to_bytes(4,"big") + body
+
+def worstCases(limits):
+    # name, data
+    half = limits.maxBytes // 2
+    notes = b"\x00\x90\x3c\x40" + b"\x00\x3c\x00\x00\x3c\x40" * (limits.maxEvents // 2 + 1)
+    return [
+        ("huge text event",header() + chunk(b"MTrk",b"\x00\xff\x01" + varLen(half) + b"a" * half)),
+        ("event limit",header() + chunk(b"MTrk",notes)),
+        ("continuation bytes",header() + chunk(b"MTrk",b"\x80" * half)),
+        ("length past the end",header() + chunk(b"MTrk",b"\x00\x90\x3c\x40",0xFFFFFFFF)),
+        ("many empty tracks",header() + chunk(b"MTrk",b"\x00\xff\x2f\x00") * (limits.maxTracks + 1)),
+        ("garbage between tracks",header() + b"\x01" * half + chunk(b"MTrk",b"\x00\x90\x3c\x40")),
+        ("only zero deltas",header() + chunk(b"MTrk",b"\x00" * half)),
+        ("division 0",header(division=0) + chunk(b"MTrk",b"\x00\x90\x3c\x40")),
+    ]
+
+def mutate(data,rng):
+    data = bytearray(data)
+    for _ in range(rng.randint(1,4)):
+        op = rng.randrange(6)
+        p = rng.randrange(len(data)) if data else 0
+        if op == 0:
+            for _ in range(rng.randint(1,16)):
+                if data:
+                    data[rng.randrange(len(data))] = rng.randrange(256)
+        elif op == 1:
+            data = data[:p]
+        elif op == 2:
+            data[p:p] = bytes(rng.randrange(256) for _ in range(rng.randint(1,64)))
+        elif op == 3:
+            data[p:p+4] = rng.choice((b"\xff\xff\xff\xff",b"\x7f\xff\xff\xff",b"\x00\x00\x00\x00"))
+        elif op == 4:
+            data[p:p] = b"\x80" * rng.randint(1,1000)
+        else:
+            q = rng.randrange(len(data)) if data else 0
+            data[p:p] = data[min(p,q):max(p,q)]
+    return bytes(data)
+
+def run(data,limits):
+    # (outcome, seconds, peak bytes)
+    start = time.perf_counter()
+    try:
+        result = decode(data,limits)
+        outcome = "skipped chunks" if result[5] else "ok"
+    except MidiError:
+        outcome = "MidiError"
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        decode(data,limits)
+    except MidiError:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return outcome,seconds,peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases",type=int,default=500,help="mutated files to try")
+    parser.add_argument("--seed",type=int,default=1)
+    parser.add_argument("--max-bytes",type=int,default=4*1024*1024,help="Limits.maxBytes used for the run")
+    parser.add_argument("--max-events",type=int,default=200000,help="Limits.maxEvents used for the run")
+    args = parser.parse_args()
+    limits = Limits(maxBytes=args.max_bytes,maxEvents=args.max_events)
+    rng = random.Random(args.seed)
+
+    seeds = []
+    for midi_dir in ("mids","trebleMids"):
+        for name in sorted(os.listdir(os.path.join(ROOT,midi_dir))):
+            if name.lower().endswith(".mid"):
+                with open(os.path.join(ROOT,midi_dir,name),"rb") as f:
+                    seeds.append(f.read())
+
+    cases = worstCases(limits)
+    for k in range(args.cases):
+        cases.append(("mutation %d" % k,mutate(rng.choice(seeds),rng)))
+
+    outcomes = {}
+    slowest = (0.0,"")
+    largest = (0,"")
+    for name,data in cases:
+        try:
+            outcome,seconds,peak = run(data,limits)
+        except Exception as e:
+            print("FAIL %s (%d bytes): %r" % (name,len(data),e))
+            return 1
+        outcomes[outcome] = outcomes.get(outcome,0) + 1
+        if seconds > slowest[0]:
+            slowest = (seconds,"%s, %d bytes" % (name,len(data)))
+        if peak > largest[0]:
+            largest = (peak,name)
+        if not name.startswith("mutation"):
+            print("%-24s %9d bytes %-15s %8.3f s %8.1f MB peak" % (name,len(data),outcome,seconds,peak/1024/1024))
+    print("%d cases: %s" % (len(cases),", ".join("%d %s" % (n,o) for o,n in sorted(outcomes.items()))))
+    print("slowest %.3f s (%s), largest peak %.1f MB (%s)" % (slowest[0],slowest[1],largest[0]/1024/1024,largest[1]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,23 @@
 import os
 import random
 
+from analyze import predict, printReport
+from enemyWalk import newSeed, renderWalkRule
+from library import formatRow, listSongs
+from durations import holdsByTime
+from emitters import Json, Sheet, SongText, WorkshopEnemies, WorkshopSong, fanOut, workshopParts
+from midiSeek import readSafeWindow, readWindow
+from noteColumns import NoteColumns
+from noteEvents import Chord, NoteEvent, ReleaseEvent, TempoEvent
+from quantize import SERVER_TICK, quantizeMidi
+from quantize import printReport as printQuantizeReport
+from safeMidi import Limits, readSafe
+from simulate import exactTimes, simulateFiles
+from songBin import readSong, readText, writeSong
+from streamMidi import mergeChords, streamEvents
+from spawnPlanner import SpawnPlanner, planPositions
+from workshopWriter import buildWorkshop, renderEnemies, writeAtomic
+
 
 class MidiFile:
     startSequence = [   [0x4D,0x54,0x68,0x64], #MThd
@@ -32,7 +49,7 @@ class MidiFile:
                 }
 
     
-    def __init__(self,midi_file,verbose=False,debug=False):
+    def __init__(self,midi_file,verbose=False,debug=False,midi_dir="trebleMids",window=None,limits=None,keepEvents=False):
         self.verbose = verbose
         self.debug = debug
         
@@ -62,21 +79,35 @@ class MidiFile:
         
         self.runningStatusSet = False
         
+        #(time, key, velocity) of every voice event for the column based tools (NoteColumns.fromMidi),
+        #only kept when asked for, they cost more memory than the notes themselves
+        self.keepEvents = keepEvents
         self.events = []
         self.notes = []
+        self.errors = []
+        self.error = None
         self.success = False
         
         print("Processing",midi_file)
         try:
-            midi_path = os.getcwd() + "\\trebleMids\\" + self.midi_file
+            midi_path = os.path.join(os.getcwd(),midi_dir,self.midi_file)
             with open(midi_path,"rb") as f:
-                self.bytes = bytearray(f.read())
-            self.readEvents()
+                #limits (safeMidi.Limits) selects the hardened decoder, which never reads past maxBytes
+                self.bytes = bytearray(f.read() if limits is None else f.read(limits.maxBytes + 1))
+            if window is not None and limits is not None:
+                readSafeWindow(self,limits,*window)
+            elif window is not None:
+                #window = (start, end, seconds), only that part of the song is decoded
+                readWindow(self,*window)
+            elif limits is not None:
+                readSafe(self,limits)
+            else:
+                self.readEvents()
             print(self.key_press_count,"notes processed")
             self.clean_notes()
             self.success = True
-        finally:
-            return
+        except Exception as e:
+            self.error = e
             
     
     def checkStartSequence(self):
@@ -116,11 +147,11 @@ class MidiFile:
         self.log("Format %d\nTracks %d\nDivisionType %d\nDivision %d" % (self.format,self.tracks,self.divisionType,self.division))
     
     def readText(self,length):
-        s = ""
-        start = self.itr
-        while(self.itr < length+start):
-            s += chr(self.bytes[self.itr])
-            self.itr+=1
+        #One slice instead of a string built byte by byte, latin-1 maps every byte to chr(byte)
+        s = self.bytes[self.itr:self.itr+length].decode("latin-1")
+        self.itr += len(s)
+        if len(s) < length:
+            raise IndexError("text runs past the end of the file")
         return s
     
     def readMidiMetaEvent(self,deltaT):
@@ -144,7 +175,7 @@ class MidiFile:
             tempo = round(60000000/self.getInt(3))
             self.tempo = tempo
             
-            self.notes.append([(self.deltaTime/self.division),"tempo=" + str(tempo)])
+            self.notes.append(TempoEvent(self.deltaTime/self.division,tempo))
             self.log("\tNew tempo is", str(tempo))
         else:
             self.itr+= length
@@ -201,12 +232,15 @@ class MidiFile:
             if(velocity == 0):
                 #Spec defines velocity == 0 as an alternate notation for key release
                 self.log(self.deltaTime/self.division,"~"+self.virtualPianoScale[map])
-                self.notes.append([(self.deltaTime/self.division),"~"+self.virtualPianoScale[map]])
+                self.notes.append(ReleaseEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
             else:
                 #Real keypress
                 self.log(self.deltaTime/self.division,self.virtualPianoScale[map])
-                self.notes.append([(self.deltaTime/self.division),self.virtualPianoScale[map]])
+                self.notes.append(NoteEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
                 self.key_press_count += 1
+            #Raw key is kept for the column based tools (velocity 0 = release)
+            if self.keepEvents:
+                self.events.append((self.deltaTime/self.division,key,velocity))
                 
         elif(type >> 4 == 0x8):
             #Key release
@@ -222,7 +256,9 @@ class MidiFile:
                 map += 12
             
             self.log(self.deltaTime/self.division,"~"+self.virtualPianoScale[map])
-            self.notes.append([(self.deltaTime/self.division),"~"+self.virtualPianoScale[map]])
+            self.notes.append(ReleaseEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
+            if self.keepEvents:
+                self.events.append((self.deltaTime/self.division,key,0))
                 
         elif(not type >> 4 in [0x8,0x9,0xA,0xB,0xD,0xE]):
             self.log("VoiceEvent",hex(type),hex(self.bytes[self.itr]),"DT",deltaT)
@@ -302,7 +338,7 @@ class MidiFile:
             if (a_time == b_time):
                 a_notes,b_notes = self.notes[i][1],self.notes[i+1][1]
                 if "tempo" not in a_notes and "tempo" not in b_notes and "~" not in a_notes and "~" not in b_notes:
-                    self.notes[i][1] += self.notes[i+1][1]
+                    self.notes[i] = Chord(a_time,a_notes + b_notes)
                     self.notes.pop(i+1)
                 else:
                     i += 1
@@ -318,15 +354,8 @@ class MidiFile:
                     if(not(self.notes[q][1][i] in letterDict)):
                         newline.append(self.notes[q][1][i])
                         letterDict[self.notes[q][1][i]] = True
-                self.notes[q][1] = "".join(newline)
-        return
-        
-    def save_song(self,song_file):
-        print("Saving notes to",song_file)
-        with open(song_file,"w") as f:
-            f.write("playback_speed=1.0\n")
-            for l in self.notes:
-                f.write(str(l[0]) + " " + str(l[1]) + "\n")
+                if(len(newline) != len(self.notes[q][1])):
+                    self.notes[q][1] = "".join(newline)
         return
         
     def save_sheet(self,sheet_file):
@@ -353,30 +382,30 @@ class MidiFile:
                 f.write(s)
         return
         
-def get_file_choice():
-    path = os.getcwd() + "\\trebleMids"
-    fileList = os.listdir(path)
-    #print(fileList)
-    midList = []
-    for f in fileList:
-        if(".mid" in f or ".mid" in f.lower()):
-            midList.append(f)
-    print("\nType the number of a midi file press enter:\n")
-    for i in range(len(midList)):
-        print(i+1,":",midList[i])
-
-    choice = int(input(">"))
-    print()
-    choice_index = int(choice)
-    return midList[choice_index-1]
+def get_file_choice(midi_dir="trebleMids"):
+    songs = listSongs(midi_dir)
+    if not songs:
+        print("No midi files in",midi_dir)
+        return None
+    while True:
+        print("\nType the number of a midi file press enter (or some text to search):\n")
+        for i in range(len(songs)):
+            print(i+1,":",formatRow(songs[i]))
+
+        choice = input(">").strip()
+        print()
+        if choice.isdigit() and 1 <= int(choice) <= len(songs):
+            return songs[int(choice)-1]["name"]
+        songs = listSongs(midi_dir,choice or None)
+        if not songs:
+            print("Nothing matches '%s', showing every file" % choice)
+            songs = listSongs(midi_dir)
 
 # to build, use "cd (playsong directory)"
 # pyinstaller --onefile playSong.py
 
-import keyboard
 import threading
 import sys
-import math
 
 global isPlaying
 global infoTuple
@@ -385,6 +414,7 @@ sys.setrecursionlimit(10000)
 
 owNotes = []
 owTimes = []
+owBeats = []
 isPlaying = False
 storedIndex = 0
 wait = 0
@@ -394,39 +424,24 @@ white = {'1':0, '2':1, '3':2, '4':3, '5':4, '6':5, '7':6, '8':7, '9':8, '0':9, '
 black = {'!':0, '@':1, '$':2, '%':3, '^':4, '*':5, '(':6, 'Q':7, 'W':8, 'E':9, 'T':10, 'Y':11, 'I':12, 'O':13, 'P':14, 'S':15, 'D':16, 'G':17, 'H':18, 'J':19,
         'L':20, 'Z':21, 'C':22, 'V':23, 'B':24}
 
-song_file = "OW-Enem.txt"
-f = open(song_file,"w")
-
 key_delete = 'delete'
 key_shift = 'shift'
 key_end = 'end'
 key_home = 'home'
     
-def processFile():
+def processFile(song_file="song.owsb"):
     global playback_speed
-    with open("song.txt","r") as macro_file:
-        lines = macro_file.read().split("\n")
-        tOffsetSet = False
-        tOffset = 0
-        playback_speed = float(lines[0].split("=")[1])
-        print("Playback speed is set to %.2f" % playback_speed)
-        tempo = 60/float(lines[1].split("=")[1])
-        
-        processedNotes = []
-        
-        for l in lines[1:]:
-            l = l.split(" ")
-            if(len(l) < 2):
-                # print("INVALID LINE")
-                continue
-            
-            waitToPress = float(l[0])
-            notes = l[1]
-            processedNotes.append([waitToPress,notes])
-            if(not tOffsetSet):
-                tOffset = waitToPress
-                print("Start time offset =",tOffset)
-                tOffsetSet = True
+    if song_file.endswith(".txt"):
+        playback_speed,processedNotes = readText(song_file)
+    else:
+        playback_speed,processedNotes = readSong(song_file)
+    print("Playback speed is set to %.2f" % playback_speed)
+    if not processedNotes:
+        raise ValueError(song_file + " holds no notes")
+    tempo = 60/float(processedNotes[0][1].split("=")[1])
+
+    tOffset = processedNotes[0][0]
+    print("Start time offset =",tOffset)
 
     return [tempo,tOffset,processedNotes]
 
@@ -441,9 +456,11 @@ def floorToZero(i):
 def parseInfo():
     global owNotes
     global owTimes
+    global owBeats
 
     owNotes = []
     owTimes = []
+    owBeats = []
     prevTime = 0
 
     tempo = infoTuple[0]
@@ -471,10 +488,12 @@ def parseInfo():
                 owNotes.append(infoTuple[2][i][1])
                 owTimes.append((infoTuple[2][i][0] - prevTime) * tempo)
                 prevTime = infoTuple[2][i][0]
+                owBeats.append(prevTime)
             #note[0] = (nextNote[0] - note[0]) * tempo
             i += 1
 
     # let's just hold the last note for 1 second because we have no data on it
+    # (with --holds its real length only goes into the enemHold array)
     notes[len(notes)-1][0] = 1.00
 
     return notes
@@ -516,34 +535,53 @@ def getPosition(time, last):
         string = "Vector(" + str(x) + ", " +str(y)+ ", " + str(z) + ")"
     return (string)
 
-def createOW():
-    global storedIndex
+def vectorOf(string):
+    return tuple(float(v) for v in string[len("Vector("):-1].split(", "))
+
+def createOW(ow_file="OW-Enem.txt",holds=None,seed=None,planner=None):
     global owTimes
     global owNotes
 
-    pos = -1 
-    x = 0
-    #print(owNotes)
-    #print(owTimes)
-
-    while x <= math.floor(len(owNotes) / 100):
-        f.write("rule(\"ENEMY PART " + str(x) + "\")\n{\n\tevent\n\t{\n\t\tOngoing - Global;\n\t}\n\n\tactions\n\t{\n")
-        for y in range(0, 100):
-            if y + (x)*100 < len(owNotes):
-                note = owNotes[y + (x-1)*100 - 1]
-                pos = getPosition(owTimes[y + (x)*100], pos)
-                if y % 100 == 99 or y % 100 == 49:
-                    f.write("\t\tModify Global Variable (enemTime, Append To Array, %2.4f);\n" % (float(owTimes[y + (x)*100]) - 0.033))
-                else:
-                    f.write("\t\tModify Global Variable (enemTime, Append To Array, %2.4f);\n" % owTimes[y + (x)*100])
-                f.write("\t\tModify Global Variable (enemPos, Append To Array, " + pos + ");\n")
-            if(y + (x)*100 == len(owNotes)):
-                f.write("\t\tGlobal.numEnems = " + str(len(owNotes)) + ";\n")
-        #print(y + (x)*100)
-        f.write("\t}\n}\n\n")
-        x += 1
+    if seed is not None:
+        #Positions are generated in game from the seed, see enemyWalk
+        print("Saving workshop enemies to",ow_file,"(runtime positions, seed %d)" % seed)
+        writeAtomic(ow_file,renderEnemies(owTimes[:len(owNotes)],None,holds) + renderWalkRule(seed))
+        return
+
+    if planner is not None:
+        #getPosition still picks the spot, the planner moves enemies that would overlap a live one
+        walk = lambda i,last: vectorOf(getPosition(owTimes[i], -1 if last is None else "Vector(%s, %s, %s)" % last))
+        lives = None if holds is None else [max(h,planner.life) for h in holds]
+        positions = ["Vector(%s, %s, %s)" % p for p in planPositions(owTimes[:len(owNotes)],planner,walk,lives)]
+        if planner.crowded:
+            print("Spread: no free spot for",planner.crowded,"enemies, they were placed as far apart as possible")
+        print("Saving workshop enemies to",ow_file)
+        writeAtomic(ow_file,renderEnemies(owTimes,positions,holds))
+        return
+
+    pos = -1
+    positions = []
+    for i in range(len(owNotes)):
+        pos = getPosition(owTimes[i], pos)
+        positions.append(pos)
+    print("Saving workshop enemies to",ow_file)
+    writeAtomic(ow_file,renderEnemies(owTimes,positions,holds))
     return
     
+def makeEmitters(specs,holdAt=None,stream=False):
+    # --emit FORMAT[=FILE] to emitters, None if a format is unknown
+    outputs = {"song": lambda p: SongText(p or "song.txt",stream=stream),
+               "sheet": lambda p: Sheet(p or "sheet.txt",stream=stream),
+               "workshop": lambda p: WorkshopSong(p or "OW-Song.txt",holdAt,stream),
+               "enemies": lambda p: WorkshopEnemies(getPosition,p or "OW-Enem.txt",holdAt,stream),
+               "json": lambda p: Json(p or "song.json",stream=stream)}
+    specs = [spec.partition("=") for spec in specs]
+    for kind,_,path in specs:
+        if kind not in outputs:
+            print("Unknown output '%s', use song, sheet, workshop, enemies, json" % kind)
+            return None
+    return [outputs[kind](path) for kind,_,path in specs]
+    
 def main():
     import sys
 
@@ -553,8 +591,58 @@ def main():
     global owTimes
     global owNotes
 
-    if len(sys.argv) > 1:
-        midi_file = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_file",nargs="?")
+    parser.add_argument("--skyline",action="store_true",help="take the melody of a full MIDI from mids/ instead of a treble-only export")
+    parser.add_argument("--voice",type=int,default=0,help="voice kept at each onset (0 = highest, -1 = lowest)")
+    parser.add_argument("--min-gap",type=float,default=0.0,help="minimum seconds between two enemies")
+    parser.add_argument("--split",type=int,default=None,help="ignore keys below this MIDI key (60 = middle C)")
+    parser.add_argument("--analyze",action="store_true",help="only print the predicted workshop size, write nothing")
+    parser.add_argument("--start",type=float,help="convert only from this beat (or second with --seconds)")
+    parser.add_argument("--end",type=float,help="convert only up to this beat (or second with --seconds)")
+    parser.add_argument("--seconds",action="store_true",help="--start/--end are in seconds instead of beats")
+    parser.add_argument("--quantize",action="store_true",help="snap onsets to a grid and merge the ones that collapse into chords")
+    parser.add_argument("--grid",type=float,default=SERVER_TICK,help="quantize grid in seconds (default one 60 Hz server tick)")
+    parser.add_argument("--subdivision",type=int,help="quantize to 1/N beat instead of --grid")
+    parser.add_argument("--max-nps",type=float,help="with --quantize, thin chords above this many per second")
+    parser.add_argument("--holds",action="store_true",help="also write note lengths (holdQ / enemHold arrays, the template must declare them)")
+    placement = parser.add_mutually_exclusive_group()
+    placement.add_argument("--runtime-positions",action="store_true",help="generate enemy positions in game from a seed instead of writing every Vector (the template must declare the enem* walk variables)")
+    parser.add_argument("--seed",type=int,help="seed for --runtime-positions (random by default)")
+    placement.add_argument("--spread",type=float,help="keep enemies that are alive at the same time at least this far apart")
+    parser.add_argument("--enemy-life",type=float,default=1.0,help="seconds an enemy stays alive for --spread (at least its hold with --holds)")
+    parser.add_argument("--safe",action="store_true",help="decode with the hardened parser (bounds checked, size limits, corrupt tracks skipped)")
+    parser.add_argument("--emit",action="append",metavar="FORMAT[=FILE]",help="write song, sheet, workshop, enemies or json in one pass over the song instead of the usual files (repeatable)")
+    parser.add_argument("--stream",action="store_true",help="convert in constant memory for very large files (writes only the --emit outputs, enemies by default)")
+    parser.add_argument("--simulate",action="store_true",help="replay the written workshop arrays on the 60 Hz server clock and print the load per tick")
+    parser.add_argument("--template",help="also write the finished workshop code from this template.txt")
+    parser.add_argument("--marker",help="template line replaced by the generated rules (default: line 442)")
+    parser.add_argument("--workshop",default="workshop.txt",help="workshop code written with --template")
+    parser.add_argument("--part",action="append",default=[],help="another rules file spliced in with --template, e.g. the OW-Enem.txt of the same song (repeatable)")
+    args = parser.parse_args()
+    #Flags the --stream and --emit paths would ignore, --emit places enemies with getPosition
+    for flag,others in (("stream",("skyline","runtime_positions","spread","start","end","quantize","holds","analyze","safe","simulate")),
+                        ("emit",("runtime_positions","spread"))):
+        for other in others:
+            if getattr(args,flag) and getattr(args,other) not in (None,False):
+                parser.error("--%s can't be combined with --%s" % (flag,other.replace("_","-")))
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error("--end must be after --start")
+    if args.spread is not None and not args.spread > 0:
+        parser.error("--spread must be above 0")
+    if not args.grid > 0:
+        parser.error("--grid must be above 0 seconds")
+    if args.subdivision is not None and args.subdivision < 1:
+        parser.error("--subdivision must be 1 or more")
+    if args.max_nps is not None and not args.quantize:
+        parser.error("--max-nps needs --quantize")
+    if args.max_nps is not None and not args.max_nps > 0:
+        parser.error("--max-nps must be above 0")
+    midi_dir = "mids" if args.skyline else "trebleMids"
+
+    if args.midi_file:
+        midi_file = args.midi_file
         if not os.path.exists(midi_file):
             print(f"Error: file not found '{midi_file}'")
             return 1
@@ -564,24 +652,102 @@ def main():
             print("make sure this file ends in '.mid'")
             return 1
     else:
-        midi_file = get_file_choice()
+        if not sys.stdin.isatty():
+            print("Error: no midi_file given and no terminal to pick one from the list")
+            return 1
+        midi_file = get_file_choice(midi_dir)
+        if midi_file is None:
+            return 1
     
+    for part in args.part:
+        if not os.path.exists(part):
+            print(f"Error: file not found '{part}'")
+            return 1
+
+    window = None
+    if args.start is not None or args.end is not None:
+        window = (args.start or 0.0,args.end,args.seconds)
+
+    if args.stream:
+        #Tracks are decoded and merged lazily, no MidiFile and no song.owsb
+        emitters = makeEmitters(args.emit or ["enemies"],stream=True)
+        if emitters is None:
+            return 1
+        print("Streaming",midi_file)
+        count = [0]
+        with open(os.path.join(midi_dir,midi_file),"rb") as f:
+            fanOut(mergeChords(streamEvents(f),count),emitters)
+        print(count[0],"notes processed")
+        if args.template:
+            buildWorkshop(args.template,args.workshop,workshopParts(emitters) + args.part,args.marker)
+        return 0
+
     try:
-        midi = MidiFile(midi_file)
+        midi = MidiFile(midi_file,midi_dir=midi_dir,window=window,limits=Limits() if args.safe else None,
+                        keepEvents=args.skyline or args.holds)
     except Exception as e:
         print("An error has occured during processing::\n\n")
         raise e
         return 1
+    if not midi.success:
+        if args.safe:
+            print("Could not read",midi_file + ":",midi.error)
+            return 1
+        print("Warning: reading stopped early,",repr(midi.error))
+    if window and not any(not isinstance(e,(TempoEvent,ReleaseEvent)) for e in midi.notes):
+        print("Error: no notes between --start and --end in",midi_file)
+        return 1
+
+    if args.skyline:
+        from skyline import skylineNotes
+        midi.notes = skylineNotes(NoteColumns.fromMidi(midi),args.voice,args.min_gap,args.split)
+        print(sum(1 for _,n in midi.notes if "tempo" not in n),"melody notes kept")
     
-    song_file = "song.txt"
+    if args.quantize:
+        printQuantizeReport(quantizeMidi(midi,args.grid,args.subdivision,args.max_nps))
+
+    if args.analyze:
+        printReport(midi_file,predict(midi.notes))
+        return 0
+
+    if args.emit:
+        holdAt = holdsByTime(NoteColumns.fromMidi(midi)) if args.holds else None
+        emitters = makeEmitters(args.emit,holdAt)
+        if emitters is None:
+            return 1
+        fanOut(midi.notes,emitters)
+        if args.template:
+            buildWorkshop(args.template,args.workshop,workshopParts(emitters) + args.part,args.marker)
+        workshops = workshopParts(emitters)
+        if args.simulate and workshops:
+            simulateFiles(workshops,exactTimes(midi.notes),args.enemy_life)
+        return 0
+
+    song_file = "song.owsb"
     
-    midi.save_song(song_file)
+    writeSong(song_file,midi.notes)
+
+    holds = None
+    if args.holds:
+        holdAt = holdsByTime(NoteColumns.fromMidi(midi))
 
     infoTuple = processFile()
     infoTuple[2] = parseInfo()
-    createOW()
+    if args.holds:
+        holds = [holdAt.get(b,0.0) for b in owBeats]
+    seed = None
+    if args.runtime_positions:
+        seed = args.seed if args.seed is not None else newSeed()
+    planner = None
+    if args.spread:
+        planner = SpawnPlanner(args.spread,args.enemy_life)
+    createOW(holds=holds,seed=seed,planner=planner)
+    if args.template:
+        buildWorkshop(args.template,args.workshop,["OW-Enem.txt"] + args.part,args.marker)
+    if args.simulate:
+        simulateFiles(["OW-Enem.txt"],exactTimes(midi.notes),args.enemy_life)
 
     return 0
                 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,5 +1,21 @@
 import os
 
+from analyze import predict, printReport
+from library import formatRow, listSongs
+from durations import holdsByTime
+from emitters import Json, Sheet, SongText, WorkshopEnemies, WorkshopSong, fanOut, workshopParts
+from midiSeek import readSafeWindow, readWindow
+from noteColumns import NoteColumns
+from noteEvents import Chord, NoteEvent, ReleaseEvent, TempoEvent
+from phrases import compress, compressionReport, renderPhrases, songTokens
+from quantize import SERVER_TICK, quantizeMidi
+from quantize import printReport as printQuantizeReport
+from safeMidi import Limits, readSafe
+from simulate import exactTimes, simulateFiles
+from songBin import readSong, readText, writeSong
+from streamMidi import mergeChords, streamEvents
+from workshopWriter import buildWorkshop, renderSong, writeAtomic
+
 
 class MidiFile:
     startSequence = [   [0x4D,0x54,0x68,0x64], #MThd
@@ -31,7 +47,7 @@ class MidiFile:
                 }
 
     
-    def __init__(self,midi_file,verbose=False,debug=False):
+    def __init__(self,midi_file,verbose=False,debug=False,midi_dir="mids",window=None,limits=None,keepEvents=False):
         self.verbose = verbose
         self.debug = debug
         
@@ -61,21 +77,35 @@ class MidiFile:
         
         self.runningStatusSet = False
         
+        #(time, key, velocity) of every voice event for the column based tools (NoteColumns.fromMidi),
+        #only kept when asked for, they cost more memory than the notes themselves
+        self.keepEvents = keepEvents
         self.events = []
         self.notes = []
+        self.errors = []
+        self.error = None
         self.success = False
         
         print("Processing",midi_file)
         try:
-            midi_path = os.getcwd() + "\\mids\\" + self.midi_file
+            midi_path = os.path.join(os.getcwd(),midi_dir,self.midi_file)
             with open(midi_path,"rb") as f:
-                self.bytes = bytearray(f.read())
-            self.readEvents()
+                #limits (safeMidi.Limits) selects the hardened decoder, which never reads past maxBytes
+                self.bytes = bytearray(f.read() if limits is None else f.read(limits.maxBytes + 1))
+            if window is not None and limits is not None:
+                readSafeWindow(self,limits,*window)
+            elif window is not None:
+                #window = (start, end, seconds), only that part of the song is decoded
+                readWindow(self,*window)
+            elif limits is not None:
+                readSafe(self,limits)
+            else:
+                self.readEvents()
             print(self.key_press_count,"notes processed")
             self.clean_notes()
             self.success = True
-        finally:
-            return
+        except Exception as e:
+            self.error = e
             
     
     def checkStartSequence(self):
@@ -115,11 +145,11 @@ class MidiFile:
         self.log("Format %d\nTracks %d\nDivisionType %d\nDivision %d" % (self.format,self.tracks,self.divisionType,self.division))
     
     def readText(self,length):
-        s = ""
-        start = self.itr
-        while(self.itr < length+start):
-            s += chr(self.bytes[self.itr])
-            self.itr+=1
+        #One slice instead of a string built byte by byte, latin-1 maps every byte to chr(byte)
+        s = self.bytes[self.itr:self.itr+length].decode("latin-1")
+        self.itr += len(s)
+        if len(s) < length:
+            raise IndexError("text runs past the end of the file")
         return s
     
     def readMidiMetaEvent(self,deltaT):
@@ -143,7 +173,7 @@ class MidiFile:
             tempo = round(60000000/self.getInt(3))
             self.tempo = tempo
             
-            self.notes.append([(self.deltaTime/self.division),"tempo=" + str(tempo)])
+            self.notes.append(TempoEvent(self.deltaTime/self.division,tempo))
             self.log("\tNew tempo is", str(tempo))
         else:
             self.itr+= length
@@ -200,12 +230,15 @@ class MidiFile:
             if(velocity == 0):
                 #Spec defines velocity == 0 as an alternate notation for key release
                 self.log(self.deltaTime/self.division,"~"+self.virtualPianoScale[map])
-                self.notes.append([(self.deltaTime/self.division),"~"+self.virtualPianoScale[map]])
+                self.notes.append(ReleaseEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
             else:
                 #Real keypress
                 self.log(self.deltaTime/self.division,self.virtualPianoScale[map])
-                self.notes.append([(self.deltaTime/self.division),self.virtualPianoScale[map]])
+                self.notes.append(NoteEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
                 self.key_press_count += 1
+            #Raw key is kept for the column based tools (velocity 0 = release)
+            if self.keepEvents:
+                self.events.append((self.deltaTime/self.division,key,velocity))
                 
         elif(type >> 4 == 0x8):
             #Key release
@@ -221,7 +254,9 @@ class MidiFile:
                 map += 12
             
             self.log(self.deltaTime/self.division,"~"+self.virtualPianoScale[map])
-            self.notes.append([(self.deltaTime/self.division),"~"+self.virtualPianoScale[map]])
+            self.notes.append(ReleaseEvent(self.deltaTime/self.division,self.virtualPianoScale[map]))
+            if self.keepEvents:
+                self.events.append((self.deltaTime/self.division,key,0))
                 
         elif(not type >> 4 in [0x8,0x9,0xA,0xB,0xD,0xE]):
             self.log("VoiceEvent",hex(type),hex(self.bytes[self.itr]),"DT",deltaT)
@@ -301,7 +336,7 @@ class MidiFile:
             if (a_time == b_time):
                 a_notes,b_notes = self.notes[i][1],self.notes[i+1][1]
                 if "tempo" not in a_notes and "tempo" not in b_notes and "~" not in a_notes and "~" not in b_notes:
-                    self.notes[i][1] += self.notes[i+1][1]
+                    self.notes[i] = Chord(a_time,a_notes + b_notes)
                     self.notes.pop(i+1)
                 else:
                     i += 1
@@ -317,15 +352,8 @@ class MidiFile:
                     if(not(self.notes[q][1][i] in letterDict)):
                         newline.append(self.notes[q][1][i])
                         letterDict[self.notes[q][1][i]] = True
-                self.notes[q][1] = "".join(newline)
-        return
-        
-    def save_song(self,song_file):
-        print("Saving notes to",song_file)
-        with open(song_file,"w") as f:
-            f.write("playback_speed=1.0\n")
-            for l in self.notes:
-                f.write(str(l[0]) + " " + str(l[1]) + "\n")
+                if(len(newline) != len(self.notes[q][1])):
+                    self.notes[q][1] = "".join(newline)
         return
         
     def save_sheet(self,sheet_file):
@@ -352,30 +380,30 @@ class MidiFile:
                 f.write(s)
         return
         
-def get_file_choice():
-    path = os.getcwd() + "\\mids"
-    fileList = os.listdir(path)
-    #print(fileList)
-    midList = []
-    for f in fileList:
-        if(".mid" in f or ".mid" in f.lower()):
-            midList.append(f)
-    print("\nType the number of a midi file press enter:\n")
-    for i in range(len(midList)):
-        print(i+1,":",midList[i])
-
-    choice = int(input(">"))
-    print()
-    choice_index = int(choice)
-    return midList[choice_index-1]
+def get_file_choice(midi_dir="mids"):
+    songs = listSongs(midi_dir)
+    if not songs:
+        print("No midi files in",midi_dir)
+        return None
+    while True:
+        print("\nType the number of a midi file press enter (or some text to search):\n")
+        for i in range(len(songs)):
+            print(i+1,":",formatRow(songs[i]))
+
+        choice = input(">").strip()
+        print()
+        if choice.isdigit() and 1 <= int(choice) <= len(songs):
+            return songs[int(choice)-1]["name"]
+        songs = listSongs(midi_dir,choice or None)
+        if not songs:
+            print("Nothing matches '%s', showing every file" % choice)
+            songs = listSongs(midi_dir)
 
 # to build, use "cd (playsong directory)"
 # pyinstaller --onefile playSong.py
 
-import keyboard
 import threading
 import sys
-import math
 
 global isPlaying
 global infoTuple
@@ -384,49 +412,29 @@ sys.setrecursionlimit(10000)
 
 owNotes = []
 owTimes = []
+owBeats = []
 isPlaying = False
 storedIndex = 0
 wait = 0
-x = 1
 conversionCases = {'!': '1', '@': '2', '£': '3', '$': '4', '%': '5', '^': '6', '&': '7', '*': '8', '(': '9', ')': '0'}
-white = {'1':0, '2':1, '3':2, '4':3, '5':4, '6':5, '7':6, '8':7, '9':8, '0':9, 'q':10, 'w':11, 'e':12, 'r':13, 't':14, 'y':15, 'u':16, 'i':17, 'o':18, 'p':19,
-        'a':20, 's':21, 'd':22, 'f':23, 'g':24, 'h':25, 'j':26, 'k':27, 'l':28, 'z':29, 'x':30, 'c':31, 'v':32, 'b':33, 'n':34, 'm':35}
-black = {'!':0, '@':1, '$':2, '%':3, '^':4, '*':5, '(':6, 'Q':7, 'W':8, 'E':9, 'T':10, 'Y':11, 'I':12, 'O':13, 'P':14, 'S':15, 'D':16, 'G':17, 'H':18, 'J':19,
-        'L':20, 'Z':21, 'C':22, 'V':23, 'B':24}
-
-song_file = "OW-Song.txt"
-f = open(song_file,"w")
-
 key_delete = 'delete'
 key_shift = 'shift'
 key_end = 'end'
 key_home = 'home'
     
-def processFile():
+def processFile(song_file="song.owsb"):
     global playback_speed
-    with open("song.txt","r") as macro_file:
-        lines = macro_file.read().split("\n")
-        tOffsetSet = False
-        tOffset = 0
-        playback_speed = float(lines[0].split("=")[1])
-        print("Playback speed is set to %.2f" % playback_speed)
-        tempo = 60/float(lines[1].split("=")[1])
-        
-        processedNotes = []
-        
-        for l in lines[1:]:
-            l = l.split(" ")
-            if(len(l) < 2):
-                # print("INVALID LINE")
-                continue
-            
-            waitToPress = float(l[0])
-            notes = l[1]
-            processedNotes.append([waitToPress,notes])
-            if(not tOffsetSet):
-                tOffset = waitToPress
-                print("Start time offset =",tOffset)
-                tOffsetSet = True
+    if song_file.endswith(".txt"):
+        playback_speed,processedNotes = readText(song_file)
+    else:
+        playback_speed,processedNotes = readSong(song_file)
+    print("Playback speed is set to %.2f" % playback_speed)
+    if not processedNotes:
+        raise ValueError(song_file + " holds no notes")
+    tempo = 60/float(processedNotes[0][1].split("=")[1])
+
+    tOffset = processedNotes[0][0]
+    print("Start time offset =",tOffset)
 
     return [tempo,tOffset,processedNotes]
 
@@ -441,9 +449,11 @@ def floorToZero(i):
 def parseInfo():
     global owNotes
     global owTimes
+    global owBeats
 
     owNotes = []
     owTimes = []
+    owBeats = []
     prevTime = 0
 
     tempo = infoTuple[0]
@@ -475,39 +485,44 @@ def parseInfo():
                 owNotes.append(infoTuple[2][i][1])
                 owTimes.append((infoTuple[2][i][0] - prevTime) * tempo)
                 prevTime = infoTuple[2][i][0]
+                owBeats.append(prevTime)
             #note[0] = (nextNote[0] - note[0]) * tempo
             i += 1
 
     return notes
 
-def createOW():
-    global x
-    global storedIndex
+def createOW(ow_file="OW-Song.txt",holds=None,phrases=False):
     global owTimes
     global owNotes
 
-    #print(owTimes)
-    #print(owNotes)
-
-    while x <= math.ceil(len(owNotes) / 100):
-        f.write("rule(\"SONG PART " + str(x) + "\")\n{\n\tevent\n\t{\n\t\tOngoing - Global;\n\t}\n\n\tactions\n\t{\n")
-        for y in range(1, 100):
-            if y + (x-1)*100 - 1 < len(owNotes):
-                note = owNotes[y + (x-1)*100 - 1]
-                numNotes = 0
-                f.write("\t\tModify Global Variable (timeQ, Append To Array, %2.4f);\n" % owTimes[y + (x-1)*100 - 1])
-                for n in note:
-                    if numNotes < 6:
-                        if n in white:
-                            f.write("\t\tModify Global Variable (posQ, Append To Array, Global.wPiano[" + str(white[n]) + "]);\n")
-                        else:
-                            f.write("\t\tModify Global Variable (posQ, Append To Array, Global.bPiano[" + str(black[n]) + "]);\n")
-                    numNotes += 1
-                f.write("\t\tModify Global Variable (notes, Append To Array, " + str(numNotes) + ");\n")
-        f.write("\t}\n}\n\n")
-        x += 1
+    print("Saving workshop song to",ow_file)
+    if phrases:
+        song = compress(songTokens(owTimes,owNotes))
+        compressionReport(owTimes,owNotes,song)
+        writeAtomic(ow_file,renderPhrases(song))
+    else:
+        writeAtomic(ow_file,renderSong(owTimes,owNotes,holds=holds))
     return
     
+def enemyPosition(seconds,last):
+    # getBots places the enemies, imported on first use
+    from getBots import getPosition
+    return getPosition(seconds,last)
+
+def makeEmitters(specs,holdAt=None,stream=False):
+    # --emit FORMAT[=FILE] to emitters, None if a format is unknown
+    outputs = {"song": lambda p: SongText(p or "song.txt",stream=stream),
+               "sheet": lambda p: Sheet(p or "sheet.txt",stream=stream),
+               "workshop": lambda p: WorkshopSong(p or "OW-Song.txt",holdAt,stream),
+               "enemies": lambda p: WorkshopEnemies(enemyPosition,p or "OW-Enem.txt",holdAt,stream),
+               "json": lambda p: Json(p or "song.json",stream=stream)}
+    specs = [spec.partition("=") for spec in specs]
+    for kind,_,path in specs:
+        if kind not in outputs:
+            print("Unknown output '%s', use song, sheet, workshop, enemies, json" % kind)
+            return None
+    return [outputs[kind](path) for kind,_,path in specs]
+
 def main():
     import sys
 
@@ -517,8 +532,50 @@ def main():
     global owTimes
     global owNotes
 
-    if len(sys.argv) > 1:
-        midi_file = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_file",nargs="?")
+    parser.add_argument("--analyze",action="store_true",help="only print the predicted workshop size, write nothing")
+    parser.add_argument("--start",type=float,help="convert only from this beat (or second with --seconds)")
+    parser.add_argument("--end",type=float,help="convert only up to this beat (or second with --seconds)")
+    parser.add_argument("--seconds",action="store_true",help="--start/--end are in seconds instead of beats")
+    parser.add_argument("--quantize",action="store_true",help="snap onsets to a grid and merge the ones that collapse into chords")
+    parser.add_argument("--grid",type=float,default=SERVER_TICK,help="quantize grid in seconds (default one 60 Hz server tick)")
+    parser.add_argument("--subdivision",type=int,help="quantize to 1/N beat instead of --grid")
+    parser.add_argument("--max-nps",type=float,help="with --quantize, thin chords above this many per second")
+    #--phrases does not store holdQ
+    lengths = parser.add_mutually_exclusive_group()
+    lengths.add_argument("--holds",action="store_true",help="also write note lengths (holdQ / enemHold arrays, the template must declare them)")
+    lengths.add_argument("--phrases",action="store_true",help="store repeated phrases once and expand them in game (the template must declare the phrase variables)")
+    parser.add_argument("--safe",action="store_true",help="decode with the hardened parser (bounds checked, size limits, corrupt tracks skipped)")
+    parser.add_argument("--emit",action="append",metavar="FORMAT[=FILE]",help="write song, sheet, workshop, enemies or json in one pass over the song instead of the usual files (repeatable)")
+    parser.add_argument("--stream",action="store_true",help="convert in constant memory for very large files (writes only the --emit outputs, workshop by default)")
+    parser.add_argument("--simulate",action="store_true",help="replay the written workshop arrays on the 60 Hz server clock and print the load per tick")
+    parser.add_argument("--template",help="also write the finished workshop code from this template.txt")
+    parser.add_argument("--marker",help="template line replaced by the generated rules (default: line 442)")
+    parser.add_argument("--workshop",default="workshop.txt",help="workshop code written with --template")
+    parser.add_argument("--part",action="append",default=[],help="another rules file spliced in with --template, e.g. the OW-Enem.txt of the same song (repeatable)")
+    args = parser.parse_args()
+    #Flags the --stream and --emit paths would ignore
+    for flag,others in (("stream",("phrases","start","end","quantize","holds","analyze","safe","simulate")),
+                        ("emit",("phrases",))):
+        for other in others:
+            if getattr(args,flag) and getattr(args,other) not in (None,False):
+                parser.error("--%s can't be combined with --%s" % (flag,other))
+
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error("--end must be after --start")
+    if not args.grid > 0:
+        parser.error("--grid must be above 0 seconds")
+    if args.subdivision is not None and args.subdivision < 1:
+        parser.error("--subdivision must be 1 or more")
+    if args.max_nps is not None and not args.quantize:
+        parser.error("--max-nps needs --quantize")
+    if args.max_nps is not None and not args.max_nps > 0:
+        parser.error("--max-nps must be above 0")
+
+    if args.midi_file:
+        midi_file = args.midi_file
         if not os.path.exists(midi_file):
             print(f"Error: file not found '{midi_file}'")
             return 1
@@ -528,24 +585,90 @@ def main():
             print("make sure this file ends in '.mid'")
             return 1
     else:
+        if not sys.stdin.isatty():
+            print("Error: no midi_file given and no terminal to pick one from the list")
+            return 1
         midi_file = get_file_choice()
+        if midi_file is None:
+            return 1
     
+    for part in args.part:
+        if not os.path.exists(part):
+            print(f"Error: file not found '{part}'")
+            return 1
+
+    window = None
+    if args.start is not None or args.end is not None:
+        window = (args.start or 0.0,args.end,args.seconds)
+
+    if args.stream:
+        #Tracks are decoded and merged lazily, no MidiFile and no song.owsb
+        emitters = makeEmitters(args.emit or ["workshop"],stream=True)
+        if emitters is None:
+            return 1
+        print("Streaming",midi_file)
+        count = [0]
+        with open(os.path.join("mids",midi_file),"rb") as f:
+            fanOut(mergeChords(streamEvents(f),count),emitters)
+        print(count[0],"notes processed")
+        if args.template:
+            buildWorkshop(args.template,args.workshop,workshopParts(emitters) + args.part,args.marker)
+        return 0
+
     try:
-        midi = MidiFile(midi_file)
+        midi = MidiFile(midi_file,window=window,limits=Limits() if args.safe else None,keepEvents=args.holds)
     except Exception as e:
         print("An error has occured during processing::\n\n")
         raise e
         return 1
+    if not midi.success:
+        if args.safe:
+            print("Could not read",midi_file + ":",midi.error)
+            return 1
+        print("Warning: reading stopped early,",repr(midi.error))
+    if window and not any(not isinstance(e,(TempoEvent,ReleaseEvent)) for e in midi.notes):
+        print("Error: no notes between --start and --end in",midi_file)
+        return 1
     
-    song_file = "song.txt"
+    if args.quantize:
+        printQuantizeReport(quantizeMidi(midi,args.grid,args.subdivision,args.max_nps))
+
+    if args.analyze:
+        printReport(midi_file,predict(midi.notes))
+        return 0
+
+    if args.emit:
+        holdAt = holdsByTime(NoteColumns.fromMidi(midi)) if args.holds else None
+        emitters = makeEmitters(args.emit,holdAt)
+        if emitters is None:
+            return 1
+        fanOut(midi.notes,emitters)
+        if args.template:
+            buildWorkshop(args.template,args.workshop,workshopParts(emitters) + args.part,args.marker)
+        workshops = workshopParts(emitters)
+        if args.simulate and workshops:
+            simulateFiles(workshops,exactTimes(midi.notes))
+        return 0
+
+    song_file = "song.owsb"
     
-    midi.save_song(song_file)
+    writeSong(song_file,midi.notes)
+
+    holds = None
+    if args.holds:
+        holdAt = holdsByTime(NoteColumns.fromMidi(midi))
 
     infoTuple = processFile()
     infoTuple[2] = parseInfo()
-    createOW()
+    if args.holds:
+        holds = [holdAt.get(b,0.0) for b in owBeats]
+    createOW(holds=holds,phrases=args.phrases)
+    if args.template:
+        buildWorkshop(args.template,args.workshop,["OW-Song.txt"] + args.part,args.marker)
+    if args.simulate:
+        simulateFiles(["OW-Song.txt"],exactTimes(midi.notes))
 
     return 0
                 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from songBin import readSong, writeText
+
+
+# Golden output corpus. "record" runs getSongNotes over mids/ and getBots over
+# trebleMids/ (random seeded, so enemy positions repeat) and keeps song.txt,
+# OW-Song.txt and OW-Enem.txt of every file with its run time. "check" runs
+# the converters of another Source folder the same way, compares every output
+# byte for byte and prints the timings side by side. "record --baseline
+# COMMIT" records the converters of an older commit instead, the goldens in
+# tests/golden come from the original scripts this way. They are only
+# replaced by a --baseline recording, record the current converters into
+# another folder with --golden.
+#
+#   python Source/golden.py record --baseline d62bd36
+#   python Source/golden.py record --golden /tmp/golden
+#   python Source/golden.py check [--source path/to/Source] [--golden /tmp/golden] [--repeat 3]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT,"tests","golden")
+SEED = 7
+
+# (script, midi folder, outputs kept)
+CORPUS = (
+    ("getSongNotes.py","mids",("song.txt","OW-Song.txt")),
+    ("getBots.py","trebleMids",("OW-Enem.txt",)),
+)
+
+# Runs one converter as __main__ with random seeded, the scripts keep their state in globals.
+# The original scripts import keyboard (only used for playback), an empty module stands in for it
+RUNNER = ("import os,random,runpy,sys,types\n"
+          "script,name,seed = sys.argv[1],sys.argv[2],int(sys.argv[3])\n"
+          "sys.path.insert(0,os.path.dirname(script))\n"
+          "try:\n"
+          "    import keyboard\n"
+          "except ImportError:\n"
+          "    sys.modules['keyboard'] = types.ModuleType('keyboard')\n"
+          "random.seed(seed)\n"
+          "sys.argv = [script,name]\n"
+          "runpy.run_path(script,run_name='__main__')\n")
+
+def corpus():
+    for script,midi_dir,outputs in CORPUS:
+        for name in sorted(os.listdir(os.path.join(ROOT,midi_dir))):
+            if name.lower().endswith(".mid"):
+                yield script,midi_dir,name,outputs
+
+def runOne(source,script,midi_dir,name,outputs,seed=SEED,timeout=300):
+    # Returns (exit code, seconds, {output: bytes or None})
+    work = tempfile.mkdtemp(prefix="golden-")
+    try:
+        # main() checks the name in the working folder, MidiFile then reads it from midi_dir
+        try:
+            os.symlink(os.path.join(ROOT,midi_dir),os.path.join(work,midi_dir))
+            os.symlink(os.path.join(ROOT,midi_dir,name),os.path.join(work,name))
+        except OSError:
+            shutil.copytree(os.path.join(ROOT,midi_dir),os.path.join(work,midi_dir),dirs_exist_ok=True)
+            shutil.copyfile(os.path.join(ROOT,midi_dir,name),os.path.join(work,name))
+        cmd = [sys.executable,"-c",RUNNER,os.path.join(source,script),name,str(seed)]
+        start = time.perf_counter()
+        try:
+            rc = subprocess.run(cmd,cwd=work,stdin=subprocess.DEVNULL,stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL,timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            rc = "timeout"
+        seconds = time.perf_counter() - start
+        # Newer converters write song.owsb, compare it as the song.txt it stands for
+        binary = os.path.join(work,"song.owsb")
+        if "song.txt" in outputs and os.path.exists(binary) and not os.path.exists(os.path.join(work,"song.txt")):
+            playback_speed,notes = readSong(binary)
+            writeText(os.path.join(work,"song.txt"),notes,playback_speed)
+        files = {}
+        for out in outputs:
+            path = os.path.join(work,out)
+            if os.path.exists(path):
+                with open(path,"rb") as f:
+                    files[out] = f.read()
+            else:
+                files[out] = None
+        return rc,seconds,files
+    finally:
+        shutil.rmtree(work,ignore_errors=True)
+
+def timed(source,script,midi_dir,name,outputs,repeat):
+    # Best of repeat runs, the outputs of the first
+    rc,best,files = runOne(source,script,midi_dir,name,outputs)
+    for _ in range(repeat - 1):
+        best = min(best,runOne(source,script,midi_dir,name,outputs)[1])
+    return rc,best,files
+
+def commitOf(source):
+    try:
+        return subprocess.run(["git","rev-parse","HEAD"],cwd=source,capture_output=True,text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def exportSource(commit,folder):
+    # Source/*.py of commit into folder. The original scripts build their paths with
+    # Windows separators ("\\mids\\"), those become / so they run anywhere
+    names = subprocess.run(["git","ls-tree","--name-only",commit,"Source/"],cwd=ROOT,capture_output=True,
+                           text=True,check=True).stdout.split()
+    for name in names:
+        if not name.endswith(".py"):
+            continue
+        text = subprocess.run(["git","show",commit + ":" + name],cwd=ROOT,capture_output=True,
+                              text=True,check=True).stdout
+        with open(os.path.join(folder,os.path.basename(name)),"w") as f:
+            f.write(text.replace("\\\\","/"))
+    return subprocess.run(["git","rev-parse",commit],cwd=ROOT,capture_output=True,text=True,check=True).stdout.strip()
+
+def record(source,golden,repeat,baseline=None):
+    if os.path.exists(golden):
+        shutil.rmtree(golden)
+    if baseline:
+        folder = tempfile.mkdtemp(prefix="golden-src-")
+        try:
+            commit = exportSource(baseline,folder)
+            return _record(folder,commit,golden,repeat)
+        finally:
+            shutil.rmtree(folder,ignore_errors=True)
+    return _record(source,commitOf(source),golden,repeat)
+
+def _record(source,commit,golden,repeat):
+    manifest = {"commit": commit,"seed": SEED,"files": {}}
+    for script,midi_dir,name,outputs in corpus():
+        rc,seconds,files = timed(source,script,midi_dir,name,outputs,repeat)
+        folder = os.path.join(golden,midi_dir,name)
+        os.makedirs(folder)
+        if rc != 0:
+            #The original scripts open OW-Song.txt on import and leave it empty when they crash,
+            #the converters now write nothing on failure
+            files = {out: data or None for out,data in files.items()}
+        for out,data in files.items():
+            if data is not None:
+                with open(os.path.join(folder,out),"wb") as f:
+                    f.write(data)
+        manifest["files"][midi_dir + "/" + name] = {"rc": rc,"seconds": seconds,
+                                                   "outputs": sorted(k for k,v in files.items() if v is not None)}
+        print("%-70s rc=%-4s %8.3f s" % (midi_dir + "/" + name,rc,seconds))
+    with open(os.path.join(golden,"manifest.json"),"w") as f:
+        json.dump(manifest,f,indent=1)
+    print("Golden outputs of",len(manifest["files"]),"files written to",golden)
+    return 0
+
+def check(source,golden,repeat):
+    with open(os.path.join(golden,"manifest.json"),"r") as f:
+        manifest = json.load(f)
+    failed = 0
+    total = [0.0,0.0]
+    print("%-70s %9s %9s %7s  %s" % ("file","golden s","new s","speedup","result"))
+    for script,midi_dir,name,outputs in corpus():
+        key = midi_dir + "/" + name
+        ref = manifest["files"].get(key)
+        rc,seconds,files = timed(source,script,midi_dir,name,outputs,repeat)
+        if ref is None:
+            print("%-70s %9s %9.3f %7s  not recorded" % (key,"-",seconds,"-"))
+            continue
+        problems = []
+        if rc != ref["rc"]:
+            problems.append("rc %s != %s" % (rc,ref["rc"]))
+        for out in outputs:
+            path = os.path.join(golden,midi_dir,name,out)
+            want = None
+            if os.path.exists(path):
+                with open(path,"rb") as f:
+                    want = f.read()
+            if files[out] != want:
+                problems.append(out + (" missing" if files[out] is None else " unexpected" if want is None else " differs"))
+        failed += bool(problems)
+        total[0] += ref["seconds"]
+        total[1] += seconds
+        print("%-70s %9.3f %9.3f %6.2fx  %s" % (key,ref["seconds"],seconds,ref["seconds"]/seconds,", ".join(problems) or "same"))
+    print("%-70s %9.3f %9.3f %6.2fx" % ("total",total[0],total[1],total[0]/total[1] if total[1] else 0))
+    if failed:
+        print(failed,"files differ from the golden outputs of commit",manifest["commit"] or "?")
+        return 1
+    print("All outputs match the golden outputs of commit",manifest["commit"] or "?")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command",choices=("record","check"))
+    parser.add_argument("--source",default=os.path.dirname(os.path.abspath(__file__)),help="Source folder holding the converters to run")
+    parser.add_argument("--golden",default=GOLDEN_DIR,help="folder of the golden outputs")
+    parser.add_argument("--repeat",type=int,default=1,help="runs per file, the fastest one is reported")
+    parser.add_argument("--baseline",metavar="COMMIT",help="record: run the converters of this commit instead of --source")
+    args = parser.parse_args()
+    source = os.path.abspath(args.source)
+    if args.command == "record" and not args.baseline and os.path.abspath(args.golden) == GOLDEN_DIR:
+        parser.error("tests/golden holds the outputs of the original scripts, record it with --baseline "
+                     "or record into another folder with --golden")
+    if args.command == "record":
+        return record(source,args.golden,args.repeat,args.baseline)
+    return check(source,args.golden,args.repeat)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+
+from analyze import ARRAY_LIMIT, LINE_LIMIT, convertErrors, predict
+from noteEvents import TempoEvent
+from streamMidi import mergeChords, streamEvents
+
+
+# SQLite index of mids/ and trebleMids/ so get_file_choice does not have to
+# list and parse every file on each run. Each file is read once through
+# streamMidi, which gives the title, tracks and tempos along with the rows
+# MidiFile.notes would hold, the workshop sizes come from analyze.predict on
+# those rows, and files are only rescanned when their mtime or size changes.
+#   python Source/library.py update
+#   python Source/library.py search [text] [--folder mids] [--fits] [--max-lines N] [--max-seconds S]
+
+DB_FILE = "library.db"
+SCAN_VERSION = 4        # bump when scanMidi or the schema changes, tables of older scans are dropped
+FOLDERS = ("mids","trebleMids")
+
+SCHEMA = """
+create table if not exists songs (
+    path text primary key,
+    folder text,
+    name text,
+    title text,
+    mtime real,
+    size integer,
+    tracks integer,
+    notes integer,
+    seconds real,
+    tempo_min integer,
+    tempo_max integer,
+    time_q integer,
+    pos_q integer,
+    enemies integer,
+    lines integer,
+    errors text
+)
+"""
+COLUMNS = ("path","folder","name","title","mtime","size","tracks","notes","seconds",
+           "tempo_min","tempo_max","time_q","pos_q","enemies","lines","errors")
+
+def scanMidi(path):
+    # One streamed pass gives the title, tracks, tempos and the rows MidiFile.notes would hold
+    names = []
+    counter = [0]
+    with open(path,"rb") as f, contextlib.redirect_stdout(io.StringIO()):
+        rows = list(mergeChords(streamEvents(f,names=names),counter))
+    bpms = [e.bpm for e in rows if isinstance(e,TempoEvent)] or [120]
+    # zero sizes when there is nothing to convert
+    info = predict(rows) if rows else {"seconds": 0.0,"timeQ": 0,"posQ": 0,"enemTime": 0,"lines": 0}
+    return {
+        "title": next((n for n in names if n is not None),None) or os.path.splitext(os.path.basename(path))[0],
+        "tracks": len(names),
+        "notes": counter[0],
+        "seconds": info["seconds"],
+        "tempo_min": min(bpms),
+        "tempo_max": max(bpms),
+        "time_q": info["timeQ"],
+        "pos_q": info["posQ"],
+        "enemies": info["enemTime"],
+        "lines": info["lines"],
+        "errors": ", ".join(convertErrors(rows)),
+    }
+
+def connect(db_file=DB_FILE):
+    db = sqlite3.connect(db_file)
+    db.row_factory = sqlite3.Row
+    db.execute(SCHEMA)
+    if db.execute("pragma user_version").fetchone()[0] < SCAN_VERSION:
+        db.execute("drop table songs")
+        db.execute(SCHEMA)
+        db.execute("pragma user_version = %d" % SCAN_VERSION)
+        db.commit()
+    return db
+
+def update(db,folders=FOLDERS):
+    # Incremental refresh: new or changed (mtime/size) files are rescanned, removed ones dropped
+    known = {r["path"]: (r["mtime"],r["size"]) for r in db.execute("select path, mtime, size from songs")}
+    seen = set()
+    scanned = 0
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            if not entry.name.lower().endswith(".mid") or not entry.is_file():
+                continue
+            path = folder + "/" + entry.name
+            seen.add(path)
+            st = entry.stat()
+            if known.get(path) == (st.st_mtime,st.st_size):
+                continue
+            try:
+                info = scanMidi(entry.path)
+            except (OSError,ValueError):
+                continue
+            info.update(path=path,folder=folder,name=entry.name,mtime=st.st_mtime,size=st.st_size)
+            db.execute("insert or replace into songs (%s) values (%s)" % (",".join(COLUMNS),",".join("?"*len(COLUMNS))),
+                       [info[c] for c in COLUMNS])
+            scanned += 1
+    gone = [p for p in known if p not in seen and p.split("/")[0] in folders]
+    db.executemany("delete from songs where path = ?",[(p,) for p in gone])
+    db.commit()
+    return scanned,len(gone)
+
+def search(db,text=None,folder=None,fits=False,max_lines=None,max_seconds=None):
+    where = []
+    args = []
+    if text:
+        where.append("(name like ? or title like ?)")
+        args += ["%" + text + "%"] * 2
+    if folder:
+        where.append("folder = ?")
+        args.append(folder)
+    if fits:
+        where.append("errors = '' and time_q <= ? and pos_q <= ? and enemies <= ? and lines <= ?")
+        args += [ARRAY_LIMIT,ARRAY_LIMIT,ARRAY_LIMIT,LINE_LIMIT]
+    if max_lines is not None:
+        where.append("lines <= ?")
+        args.append(max_lines)
+    if max_seconds is not None:
+        where.append("seconds <= ?")
+        args.append(max_seconds)
+    sql = "select * from songs"
+    if where:
+        sql += " where " + " and ".join(where)
+    return db.execute(sql + " order by name collate nocase",args).fetchall()
+
+def listSongs(folder,text=None,db_file=DB_FILE):
+    db = connect(db_file)
+    try:
+        update(db,(folder,))
+        return search(db,text,folder)
+    finally:
+        db.close()
+
+def formatRow(row):
+    return "%-55s %6.1fs %5d notes %3d-%-3d bpm %6d lines" % (row["name"],row["seconds"],row["notes"],
+                                                            row["tempo_min"],row["tempo_max"],row["lines"])
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command",choices=["update","search"])
+    parser.add_argument("text",nargs="?")
+    parser.add_argument("--db",default=DB_FILE)
+    parser.add_argument("--folder",choices=FOLDERS)
+    parser.add_argument("--fits",action="store_true",help="only songs that convert and stay under the workshop array and line limits")
+    parser.add_argument("--max-lines",type=int)
+    parser.add_argument("--max-seconds",type=float)
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    scanned,removed = update(db)
+    if args.command == "update":
+        print("%d files scanned, %d removed" % (scanned,removed))
+    else:
+        for row in search(db,args.text,args.folder,args.fits,args.max_lines,args.max_seconds):
+            print(row["folder"] + "/" + formatRow(row))
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+from bisect import bisect_left
+
+from noteEvents import NoteEvent, TempoEvent
+from safeMidi import readSafe
+
+
+# Sparse seek index for partial conversion. One cheap walk over the track
+# chunks records a checkpoint (tick, byte offset, running status) every
+# `every` events plus the tempo map. readWindow then lets MidiFile decode
+# only the events from the checkpoint before the window start up to the
+# window end, instead of the whole file. readSafeWindow is the --safe
+# version: safeMidi decodes the whole file within its limits and the window
+# is cut out of the decoded notes.
+
+
+class SeekTrack:
+
+    def __init__(self,start,end):
+        self.start = start
+        self.end = end
+        self.ticks = []
+        self.offsets = []
+        self.running = []
+
+    def checkpoint(self,tick):
+        # Last checkpoint strictly before tick, events sharing a tick may straddle a checkpoint
+        k = max(bisect_left(self.ticks,tick) - 1,0)
+        return self.ticks[k],self.offsets[k],self.running[k]
+
+
+class SeekIndex:
+
+    def __init__(self,data,every=64):
+        if data[:4] != b"MThd":
+            raise ValueError("no MThd header")
+        self.format = int.from_bytes(data[8:10],"big")
+        self.division = int.from_bytes(data[12:14],"big") & 0x7FFF or 1
+        self.tracks = []
+        self.tempos = []
+        pos = 8 + int.from_bytes(data[4:8],"big")
+        while pos + 8 <= len(data):
+            chunk = data[pos:pos+4]
+            start = pos + 8
+            pos = min(start + int.from_bytes(data[pos+4:pos+8],"big"),len(data))
+            if chunk == b"MTrk":
+                self.tracks.append(self._walk(data,start,pos,every))
+        self.tempos.sort()
+
+    def _walk(self,data,p,end,every):
+        track = SeekTrack(p,end)
+        tick = 0
+        running = -1
+        count = 0
+        while p < end:
+            if count % every == 0:
+                track.ticks.append(tick)
+                track.offsets.append(p)
+                track.running.append(running)
+            count += 1
+            delta,p = _readVarLen(data,p)
+            tick += delta
+            if p >= end:
+                break
+            status = data[p]
+            if status >= 0x80:
+                p += 1
+            else:
+                status = running
+            if status == 0xFF:
+                type = data[p]
+                length,p = _readVarLen(data,p+1)
+                if type == 0x51 and length == 3:
+                    self.tempos.append((tick,int.from_bytes(data[p:p+3],"big")))
+                elif type == 0x2F:
+                    break
+                p += length
+            elif status == 0xF0 or status == 0xF7:
+                length,p = _readVarLen(data,p)
+                p += length
+                running = -1
+            elif status < 0x80:
+                break
+            else:
+                running = status
+                p += 1 if status >> 4 in (0xC,0xD) else 2
+        if not track.ticks:
+            track.ticks.append(0)
+            track.offsets.append(track.start)
+            track.running.append(-1)
+        return track
+
+    def tempoAt(self,tick):
+        # bpm in effect at tick (120 before the first tempo event)
+        usec = 500000
+        for t,u in self.tempos:
+            if t > tick:
+                break
+            usec = u or usec
+        return round(60000000/usec)
+
+    def secondsToTick(self,seconds):
+        last = 0
+        sec = 0.0
+        usec = 500000
+        for t,u in self.tempos:
+            step = (t-last)*usec/self.division/1000000
+            if sec + step > seconds:
+                break
+            sec += step
+            last = t
+            usec = u or usec
+        return last + (seconds-sec)*1000000*self.division/usec
+
+def _readVarLen(data,p):
+    value = 0
+    while p < len(data):
+        b = data[p]
+        p += 1
+        value = (value << 7) | (b & 0x7F)
+        if b < 0x80:
+            break
+    return value,p
+
+def readWindow(midi,start,end=None,seconds=False,every=64):
+    # Decodes [start, end) of midi.bytes into midi.notes/midi.events with times re-based to 0.
+    # start/end are beats, or seconds with seconds=True
+    index = SeekIndex(midi.bytes,every)
+    midi.format = index.format
+    midi.tracks = len(index.tracks)
+    midi.division = index.division
+    if seconds:
+        startTick = index.secondsToTick(start)
+        endTick = index.secondsToTick(end) if end is not None else float("inf")
+    else:
+        startTick = start*index.division
+        endTick = end*index.division if end is not None else float("inf")
+
+    for track in index.tracks:
+        tick,midi.itr,midi.runningStatus = track.checkpoint(startTick)
+        midi.runningStatusSet = midi.runningStatus != -1
+        midi.deltaTime = tick
+        midi.log("WINDOW TRACK from",tick,"at",midi.itr)
+        while midi.itr < track.end:
+            deltaT = midi.readLength()
+            midi.deltaTime += deltaT
+            if midi.deltaTime >= endTick:
+                break
+            if(midi.bytes[midi.itr] == 0xFF):
+                midi.itr += 1
+                if not midi.readMidiMetaEvent(deltaT):
+                    break
+            elif(midi.bytes[midi.itr] == 0xF0 or midi.bytes[midi.itr] == 0xF7):
+                midi.itr += 1
+                midi.itr += midi.readLength()
+                midi.runningStatusSet = False
+                midi.runningStatus = -1
+            else:
+                midi.readVoiceEvent(deltaT)
+
+    clipWindow(midi,startTick/index.division,endTick/index.division,index.tempoAt(startTick))
+    return
+
+def clipWindow(midi,startBeat,endBeat,bpm):
+    # Keeps the notes and events in [startBeat, endBeat) re-based to 0, bpm is the tempo at startBeat
+    notes = [TempoEvent(0.0,bpm)]
+    for e in midi.notes:
+        if startBeat <= e.time < endBeat:
+            e.time -= startBeat
+            notes.append(e)
+    midi.notes = notes
+    midi.events = [(t-startBeat,k,v) for t,k,v in midi.events if startBeat <= t < endBeat]
+    midi.key_press_count = sum(1 for e in midi.notes if type(e) is NoteEvent)
+    return
+
+def beatAt(tempos,seconds):
+    # Beat at seconds for the sorted (beat, bpm) tempo map
+    beat = 0.0
+    sec = 0.0
+    bpm = 120
+    for t,b in tempos:
+        step = (t-beat)*60/bpm
+        if sec + step > seconds:
+            break
+        sec += step
+        beat = t
+        bpm = b
+    return beat + (seconds-sec)*bpm/60
+
+def readSafeWindow(midi,limits,start,end=None,seconds=False):
+    # readWindow through the hardened decoder, the whole file is decoded and then cut
+    readSafe(midi,limits)
+    tempos = sorted((e.time,e.bpm) for e in midi.notes if isinstance(e,TempoEvent))
+    if seconds:
+        start = beatAt(tempos,start)
+        end = beatAt(tempos,end) if end is not None else None
+    bpm = 120
+    for t,b in tempos:
+        if t > start:
+            break
+        bpm = b
+    clipWindow(midi,start,end if end is not None else float("inf"),bpm)
+    return
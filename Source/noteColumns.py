@@ -0,0 +1,98 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from noteEvents import NoteEvent, ReleaseEvent, TempoEvent
+
+
+virtualPianoScale = "1!2@34$5%6^78*9(0qQwWeErtTyYuiIoOpPasSdDfgGhHjJklLzZxcCvVbBnm"
+
+def keyToScale(key):
+    #Same folding as MidiFile.readVoiceEvent
+    map = key - 23 - 12 - 1
+    while(map >= len(virtualPianoScale)):
+        map -= 12
+    while(map < 0):
+        map += 12
+    return map
+
+
+class NoteColumns:
+    # Column view of the voice events of a MidiFile, sorted by time.
+    # times are in beats, velocity 0 marks a release.
+    # tempoTimes/tempos hold the tempo map (beats, bpm).
+
+    def __init__(self,times,keys,velocities,tempoTimes,tempos):
+        self.times = times
+        self.keys = keys
+        self.velocities = velocities
+        self.tempoTimes = tempoTimes
+        self.tempos = tempos
+
+    @classmethod
+    def fromMidi(cls,midi):
+        #Releases first at equal times so a re-triggered key closes the old note before the new one opens
+        events = sorted(midi.events, key=lambda e: (e[0], e[2] > 0))
+        tempoMap = [(e.time,e.bpm) for e in midi.notes if isinstance(e,TempoEvent)]
+        tempoMap.sort(key=lambda e: e[0])
+        if np is None:
+            return cls([e[0] for e in events],[e[1] for e in events],[e[2] for e in events],
+                       [t for t,_ in tempoMap],[b for _,b in tempoMap])
+        ev = np.array(events, dtype=np.float64).reshape(-1,3)
+        tm = np.array(tempoMap, dtype=np.float64).reshape(-1,2)
+        return cls(ev[:,0].copy(),ev[:,1].astype(np.int16),ev[:,2].astype(np.int16),
+                   tm[:,0].copy(),tm[:,1].copy())
+
+    def __len__(self):
+        return len(self.times)
+
+    def onsetMask(self):
+        if np is None:
+            return [v > 0 for v in self.velocities]
+        return self.velocities > 0
+
+    def seconds(self,times=None):
+        #Beats to seconds through the tempo map, 120 bpm before the first tempo event
+        if times is None:
+            times = self.times
+        tt = list(self.tempoTimes)
+        bpm = list(self.tempos)
+        if not tt or tt[0] > 0:
+            tt.insert(0,0.0)
+            bpm.insert(0,120.0)
+        if np is None:
+            starts = [0.0]
+            for k in range(1,len(tt)):
+                starts.append(starts[-1] + (tt[k]-tt[k-1])*60/bpm[k-1])
+            out = []
+            k = 0
+            for t in times:
+                while k+1 < len(tt) and tt[k+1] <= t:
+                    k += 1
+                while k > 0 and tt[k] > t:
+                    k -= 1
+                out.append(starts[k] + (t-tt[k])*60/bpm[k])
+            return out
+        #Same operations in the same order as above, so both paths give the same floats
+        tt = np.array(tt)
+        bpm = np.array(bpm,dtype=np.float64)
+        starts = np.concatenate(([0.0],np.cumsum(np.diff(tt)*60/bpm[:-1])))
+        k = np.maximum(np.searchsorted(tt,times,side="right")-1,0)
+        return starts[k] + (np.asarray(times)-tt[k])*60/bpm[k]
+
+    def toNotes(self,index):
+        #Rebuild MidiFile.notes style events for the chosen indexes plus the tempo map
+        rows = [TempoEvent(float(t),int(b)) for t,b in zip(self.tempoTimes,self.tempos)]
+        for i in index:
+            t = float(self.times[i])
+            if self.velocities[i] > 0:
+                rows.append(NoteEvent(t,virtualPianoScale[keyToScale(int(self.keys[i]))]))
+            else:
+                rows.append(ReleaseEvent(t,virtualPianoScale[keyToScale(int(self.keys[i]))]))
+        #Tempo rows stay ahead of notes sharing their time (processFile reads line 1 as tempo)
+        rows.sort(key=lambda r: (r.time, not isinstance(r,TempoEvent)))
+        #Tempo changes after the last note would leave parseInfo without a note to read
+        while len(rows) > 1 and isinstance(rows[-1],TempoEvent):
+            rows.pop()
+        return rows
@@ -0,0 +1,88 @@
+# Slotted value types for the song event stream.
+#
+# They replace the [time, "string"] lists of MidiFile.notes / processFile /
+# parseInfo but keep their shape: event[0] is the time, event[1] the legacy
+# text ("f", "~f", "tempo=120", "fhj") and "time, text = event" unpacks, so
+# code reading the old lists keeps working.
+
+
+class NoteEvent:
+    # One key press
+    __slots__ = ("time","key")
+
+    def __init__(self,time,key):
+        self.time = time
+        self.key = key
+
+    def text(self):
+        return self.key
+
+    def __getitem__(self,i):
+        if i == 0 or i == -2:
+            return self.time
+        if i == 1 or i == -1:
+            return self.text()
+        raise IndexError(i)
+
+    def __setitem__(self,i,value):
+        if i == 0 or i == -2:
+            self.time = value
+        else:
+            raise TypeError(type(self).__name__ + " text is read only")
+
+    def __iter__(self):
+        yield self.time
+        yield self.text()
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self,other):
+        try:
+            return self.time == other[0] and self.text() == other[1]
+        except (TypeError,IndexError):
+            return NotImplemented
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (type(self).__name__,self.time,self.text())
+
+
+class ReleaseEvent(NoteEvent):
+    # One key release, text "~key"
+    __slots__ = ()
+
+    def text(self):
+        return "~" + self.key
+
+
+class Chord(NoteEvent):
+    # Key presses sharing one time, key holds every character of the chord
+    __slots__ = ()
+
+    def __setitem__(self,i,value):
+        if i == 1 or i == -1:
+            self.key = value
+        else:
+            NoteEvent.__setitem__(self,i,value)
+
+
+class TempoEvent(NoteEvent):
+    # Tempo change, key holds the bpm
+    __slots__ = ()
+
+    def text(self):
+        return "tempo=" + str(self.key)
+
+    @property
+    def bpm(self):
+        return self.key
+
+def fromText(time,text):
+    # Event for one legacy song.txt row
+    if "tempo" in text:
+        return TempoEvent(time,int(text.split("=")[1]))
+    if text[0] == "~":
+        return ReleaseEvent(time,text[1:])
+    if len(text) > 1:
+        return Chord(time,text)
+    return NoteEvent(time,text)
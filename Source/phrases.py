@@ -0,0 +1,181 @@
+from workshopWriter import POS_LINES, RULE_HEAD, RULE_TAIL
+
+
+# Phrase compression for the SONG PART arrays. Repeated runs of
+# (time delta, chord) are stored once; the song becomes a list of phrase
+# references and the PHRASE_EXPAND rule rebuilds timeQ/posQ/notes from them
+# when the game starts, so the rest of the template reads the same arrays.
+#
+#   pTime/pNotes/pPos  content of every stored token (pPos holds up to 6 keys per token)
+#   phraseStart/phraseLen/phrasePos  token range and first pPos index of each phrase
+#   phraseOrder        phrase ids in playback order
+#
+# Phrases come from an LZ style parse: at each position the longest run
+# (at least minLength tokens) already present in the stored tokens is
+# referenced, anything else is stored as a new literal run.
+
+PER_RULE = 100
+
+PTIME_LINE = "\t\tModify Global Variable (pTime, Append To Array, %s);\n"
+PNOTES_LINE = "\t\tModify Global Variable (pNotes, Append To Array, %d);\n"
+TABLE_LINES = ("\t\tModify Global Variable (phraseStart, Append To Array, %d);\n"
+               "\t\tModify Global Variable (phraseLen, Append To Array, %d);\n"
+               "\t\tModify Global Variable (phrasePos, Append To Array, %d);\n")
+ORDER_LINE = "\t\tModify Global Variable (phraseOrder, Append To Array, %d);\n"
+PPOS_LINES = {c: line.replace("(posQ,","(pPos,") for c,line in POS_LINES.items()}
+
+# Runs after the data rules (rules fire in file order) and rebuilds the arrays,
+# the Wait keeps the loop under the workshop's per-tick action budget. That spreads
+# the expansion over several ticks, so phraseReady only turns true once every
+# phrase is in place and the template must not start the song before it does
+EXPAND_RULE = """rule("PHRASE EXPAND")
+{
+\tevent
+\t{
+\t\tOngoing - Global;
+\t}
+
+\tactions
+\t{
+\t\tGlobal.phraseReady = False;
+\t\tWait(0.016, Ignore Condition);
+\t\tFor Global Variable(phraseI, 0, Count Of(Global.phraseOrder), 1);
+\t\t\tGlobal.phraseId = Global.phraseOrder[Global.phraseI];
+\t\t\tGlobal.phraseP = Global.phrasePos[Global.phraseId];
+\t\t\tFor Global Variable(phraseK, Global.phraseStart[Global.phraseId], Global.phraseStart[Global.phraseId] + Global.phraseLen[Global.phraseId], 1);
+\t\t\t\tModify Global Variable(timeQ, Append To Array, Global.pTime[Global.phraseK]);
+\t\t\t\tFor Global Variable(phraseJ, 0, Min(Global.pNotes[Global.phraseK], 6), 1);
+\t\t\t\t\tModify Global Variable(posQ, Append To Array, Global.pPos[Global.phraseP]);
+\t\t\t\t\tGlobal.phraseP += 1;
+\t\t\t\tEnd;
+\t\t\t\tModify Global Variable(notes, Append To Array, Global.pNotes[Global.phraseK]);
+\t\t\tEnd;
+\t\t\tWait(0.016, Ignore Condition);
+\t\tEnd;
+\t\tGlobal.phraseReady = True;
+\t}
+}
+
+"""
+
+
+class PhraseSong:
+
+    def __init__(self,tokens,stored,phrases,order):
+        self.tokens = tokens        # distinct (time text, chord) pairs, indexed by token id
+        self.stored = stored        # token ids in pTime order
+        self.phrases = phrases      # (start, length) into stored
+        self.order = order          # phrase ids in playback order
+
+    def phrasePos(self):
+        # first pPos index of every phrase
+        offsets = [0]
+        for t in self.stored:
+            offsets.append(offsets[-1] + min(len(self.tokens[t][1]),6))
+        return [offsets[start] for start,_ in self.phrases]
+
+    def expand(self):
+        # Python reference of PHRASE_EXPAND, returns the (time text, chord) stream
+        out = []
+        for p in self.order:
+            start,length = self.phrases[p]
+            out.extend(self.tokens[t] for t in self.stored[start:start+length])
+        return out
+
+    def sizes(self):
+        stored = [self.tokens[t] for t in self.stored]
+        return {
+            "pTime": len(stored),
+            "pPos": sum(min(len(c),6) for _,c in stored),
+            "phrases": len(self.phrases),
+            "phraseOrder": len(self.order),
+        }
+
+def songTokens(owTimes,owNotes):
+    # The (time, chord) pairs renderSong emits, SONG PART x skips every 100th chord
+    return [("%2.4f" % owTimes[k],owNotes[k]) for k in range(len(owNotes)) if k % 100 != 99]
+
+def compress(stream,minLength=4,candidates=16):
+    ids = {}
+    tokens = []
+    seq = []
+    for tok in stream:
+        t = ids.get(tok)
+        if t is None:
+            t = ids[tok] = len(tokens)
+            tokens.append(tok)
+        seq.append(t)
+
+    stored = []
+    index = {}
+    segments = []
+    literal = False
+    i = 0
+    n = len(seq)
+    while i < n:
+        bestStart,bestLen = 0,0
+        if i + minLength <= n:
+            for p in index.get(tuple(seq[i:i+minLength]),())[-candidates:]:
+                length = minLength
+                while i+length < n and p+length < len(stored) and stored[p+length] == seq[i+length]:
+                    length += 1
+                if length > bestLen:
+                    bestStart,bestLen = p,length
+        if bestLen >= minLength:
+            segments.append((bestStart,bestLen))
+            literal = False
+            i += bestLen
+            continue
+        pos = len(stored)
+        stored.append(seq[i])
+        if literal:
+            start,length = segments[-1]
+            segments[-1] = (start,length+1)
+        else:
+            segments.append((pos,1))
+            literal = True
+        if pos + 1 >= minLength:
+            index.setdefault(tuple(stored[pos+1-minLength:pos+1]),[]).append(pos+1-minLength)
+        i += 1
+
+    phraseIds = {}
+    phrases = []
+    order = []
+    for seg in segments:
+        p = phraseIds.get(seg)
+        if p is None:
+            p = phraseIds[seg] = len(phrases)
+            phrases.append(seg)
+        order.append(p)
+    return PhraseSong(tokens,stored,phrases,order)
+
+def renderPhrases(song):
+    out = []
+    write = out.append
+    lines = []
+    for t in song.stored:
+        time,chord = song.tokens[t]
+        lines.append(PTIME_LINE % time + "".join(PPOS_LINES[c] for c in chord[:6]) + PNOTES_LINE % len(chord))
+    positions = song.phrasePos()
+    for p,(start,length) in enumerate(song.phrases):
+        lines.append(TABLE_LINES % (start,length,positions[p]))
+    for p in song.order:
+        lines.append(ORDER_LINE % p)
+    part = 1
+    for k in range(0,len(lines),PER_RULE):
+        write(RULE_HEAD % ("SONG PHRASES",part))
+        write("".join(lines[k:k+PER_RULE]))
+        write(RULE_TAIL)
+        part += 1
+    write(EXPAND_RULE)
+    return "".join(out)
+
+def compressionReport(owTimes,owNotes,song):
+    stream = songTokens(owTimes,owNotes)
+    sizes = song.sizes()
+    plain = 2*len(stream) + sum(min(len(c),6) for _,c in stream)
+    packed = 2*sizes["pTime"] + sizes["pPos"] + 3*sizes["phrases"] + sizes["phraseOrder"]
+    print("Phrases: %d chords stored once for %d played, %d phrases, order length %d" % (
+        sizes["pTime"],len(stream),sizes["phrases"],sizes["phraseOrder"]))
+    print("  append actions %d -> %d, largest array %d" % (plain,packed,max(sizes.values())))
+    return
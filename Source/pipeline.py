@@ -0,0 +1,205 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from analyze import overLimits, predict
+from emitters import fanOut, walk
+from noteColumns import NoteColumns
+from noteEvents import ReleaseEvent, TempoEvent
+from safeMidi import Limits
+from workshopWriter import FILE_MODE, tempNear, writeAtomic
+
+
+# Non-interactive conversion for build pipelines. Every path is explicit
+# ("-" reads the MIDI from stdin or writes an output to stdout), nothing is
+# written to the working directory and each job runs in its own temp dir, so
+# any number of jobs can run side by side. Log lines go to stderr and a JSON
+# manifest of the run (timings, counts, sizes, return code) is written with
+# --manifest. Outputs go through the emitters, in one pass over the song.
+#
+#   python Source/pipeline.py song.mid --emit workshop=out/OW-Song.txt --manifest out/song.json
+#   cat song.mid | python Source/pipeline.py - --bots --emit enemies=- > OW-Enem.txt
+#
+# Return codes: 0 converted, 1 the MIDI could not be converted, 2 bad arguments.
+
+
+def convert(args,outputs,job,manifest):
+    # Reads the MIDI, writes the (format, destination) outputs into job and returns [(temp path, destination)]
+    if args.bots:
+        from getBots import MidiFile, makeEmitters
+    else:
+        from getSongNotes import MidiFile, makeEmitters
+    start = time.perf_counter()
+    if args.midi_file == "-":
+        path = os.path.join(job,"stdin.mid")
+        with open(path,"wb") as f:
+            shutil.copyfileobj(sys.stdin.buffer,f)
+    else:
+        path = os.path.abspath(args.midi_file)
+    window = None
+    if args.start is not None or args.end is not None:
+        window = (args.start or 0.0,args.end,args.seconds)
+    midi = MidiFile(os.path.basename(path),midi_dir=os.path.dirname(path),window=window,limits=Limits() if args.safe else None,
+                    keepEvents=args.skyline or args.holds)
+    manifest["sizes"]["input"] = os.path.getsize(path)
+    if not midi.success:
+        if args.safe or not midi.notes:
+            raise ValueError("could not read %s: %s" % (args.midi_file,midi.error))
+        print("Warning: reading stopped early,",repr(midi.error))
+    if args.skyline:
+        from skyline import skylineNotes
+        midi.notes = skylineNotes(NoteColumns.fromMidi(midi))
+    if not any(not isinstance(e,(TempoEvent,ReleaseEvent)) for e in midi.notes):
+        raise ValueError("no notes in %s" % args.midi_file)
+    manifest["seconds"]["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    specs = []
+    moves = []
+    for k,(kind,dest) in enumerate(outputs):
+        tmp = os.path.join(job,"%d-%s" % (k,kind))
+        specs.append(kind + "=" + tmp)
+        moves.append((tmp,dest))
+    holdAt = None
+    if args.holds:
+        from durations import holdsByTime
+        holdAt = holdsByTime(NoteColumns.fromMidi(midi))
+    fanOut(midi.notes,makeEmitters(specs,holdAt))
+    manifest["seconds"]["convert"] = time.perf_counter() - start
+
+    chords = [c for _,c in walk(midi.notes) if c is not None]
+    counts = manifest["counts"]
+    counts["noteOns"] = midi.key_press_count
+    counts["rows"] = len(midi.notes)
+    counts["tempos"] = sum(1 for e in midi.notes if isinstance(e,TempoEvent))
+    counts["presses"] = sum(len(e.key) for e in midi.notes if not isinstance(e,(TempoEvent,ReleaseEvent)))
+    counts["chords"] = len(chords)
+    info = predict(midi.notes)
+    manifest["workshop"] = {k: info[k] for k in ("timeQ","posQ","notes","enemTime","enemPos","lines")}
+    manifest["workshop"]["seconds"] = info["seconds"]
+    manifest["workshop"]["overLimits"] = overLimits(info)
+    return moves
+
+def deliver(moves,manifest):
+    # Temp outputs to their destinations. Every file is staged next to its destination first
+    # (the job dir may be on another disk) and only then renamed into place, so a failure
+    # leaves no output half delivered; stdout goes last
+    staged = []
+    try:
+        for tmp,dest in moves:
+            if dest != "-":
+                folder = os.path.dirname(os.path.abspath(dest))
+                os.makedirs(folder,exist_ok=True)
+                fd,part = tempNear(dest)
+                os.close(fd)
+                staged.append((part,dest))
+                shutil.move(tmp,part)
+                os.chmod(part,FILE_MODE)
+    except BaseException:
+        for part,_ in staged:
+            if os.path.exists(part):
+                os.remove(part)
+        raise
+    for part,dest in staged:
+        os.replace(part,dest)
+    for tmp,dest in moves:
+        if dest == "-":
+            with open(tmp,"rb") as f:
+                shutil.copyfileobj(f,sys.stdout.buffer)
+            sys.stdout.flush()
+    for tmp,dest in moves:
+        manifest["outputs"].append({"path": dest,"bytes": os.path.getsize(tmp if dest == "-" else dest)})
+    return
+
+def parseArgs(parser):
+    # (args, [(format, destination)]), bad arguments exit through parser.error with code 2
+    args = parser.parse_args()
+    if args.midi_file != "-" and not os.path.isfile(args.midi_file):
+        parser.error("file not found '%s'" % args.midi_file)
+    if args.skyline and not args.bots:
+        parser.error("--skyline needs --bots")
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error("--end must be after --start")
+    formats = ("song","sheet","workshop","enemies","json")
+    outputs = []
+    for spec in args.emit or [("enemies" if args.bots else "workshop") + "=-"]:
+        kind,_,dest = spec.partition("=")
+        if kind not in formats:
+            parser.error("unknown output '%s', use %s" % (kind,", ".join(formats)))
+        outputs.append((kind,dest or "-"))
+    if sum(1 for _,dest in outputs if dest == "-") + (args.manifest == "-") > 1:
+        parser.error("only one output can go to stdout")
+    return args,outputs
+
+def writeManifest(path,manifest):
+    if path == "-":
+        json.dump(manifest,sys.stdout,indent=1)
+        print()
+    elif path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)),exist_ok=True)
+        writeAtomic(path,json.dumps(manifest,indent=1) + "\n")
+    return
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_file",help="MIDI file to convert, - reads it from stdin")
+    parser.add_argument("--emit",action="append",metavar="FORMAT=FILE",help="output to write, FILE - is stdout (song, sheet, workshop, enemies, json). Default workshop=-, enemies=- with --bots")
+    parser.add_argument("--manifest",help="write the JSON run manifest here (- for stdout)")
+    parser.add_argument("--bots",action="store_true",help="convert like getBots (ENEMY PART output) instead of getNotes")
+    parser.add_argument("--skyline",action="store_true",help="with --bots, keep only the melody of a full MIDI")
+    parser.add_argument("--start",type=float,help="convert only from this beat (or second with --seconds)")
+    parser.add_argument("--end",type=float,help="convert only up to this beat (or second with --seconds)")
+    parser.add_argument("--seconds",action="store_true",help="--start/--end are in seconds instead of beats")
+    parser.add_argument("--holds",action="store_true",help="also write note lengths (holdQ / enemHold arrays)")
+    parser.add_argument("--safe",action="store_true",help="decode with the hardened parser")
+    parser.add_argument("--tmp",help="folder for the job's temp dir (default the system temp folder)")
+    parser.add_argument("--keep",action="store_true",help="keep the job's temp dir")
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(err):
+            args,outputs = parseArgs(parser)
+    except SystemExit as e:
+        sys.stderr.write(err.getvalue())
+        if e.code != 2:
+            raise
+        #Bad arguments still get a manifest when its path can be made out
+        early = argparse.ArgumentParser(add_help=False)
+        early.add_argument("--manifest")
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                path = early.parse_known_args()[0].manifest
+        except SystemExit:
+            path = None
+        lines = err.getvalue().strip().splitlines()
+        writeManifest(path,{"input": None,"converter": None,"job": None,"rc": 2,"error": lines[-1] if lines else "bad arguments",
+                            "seconds": {},"counts": {},"sizes": {},"outputs": []})
+        return 2
+    sys.stderr.write(err.getvalue())
+
+    job = tempfile.mkdtemp(prefix="owjob-",dir=args.tmp)
+    manifest = {"input": args.midi_file,"converter": "getBots" if args.bots else "getNotes","job": job,
+                "rc": 0,"error": None,"seconds": {},"counts": {},"sizes": {},"outputs": []}
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            moves = convert(args,outputs,job,manifest)
+        deliver(moves,manifest)
+    except Exception as e:
+        manifest["rc"] = 1
+        manifest["error"] = "%s: %s" % (type(e).__name__,e)
+        print("Error:",manifest["error"],file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(job,ignore_errors=True)
+    manifest["seconds"]["total"] = time.perf_counter() - start
+    writeManifest(args.manifest,manifest)
+    return manifest["rc"]
+
+if __name__ == "__main__":
+    sys.exit(main())
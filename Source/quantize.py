@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from collections import deque
+
+from analyze import predict
+from noteEvents import ReleaseEvent, TempoEvent
+
+
+# Onset quantization for MidiFile.notes. Times are snapped to a grid in
+# seconds (SERVER_TICK by default, the workshop can't resolve anything finer)
+# or to a musical subdivision in beats; onsets that land together are merged
+# into chords by MidiFile.clean_notes, and runs faster than maxNps chords per
+# second can be thinned.
+
+SERVER_TICK = 1/60
+
+
+class TempoMap:
+    # Beats <-> seconds through the tempo events of a song (120 bpm until the first one)
+
+    def __init__(self,notes):
+        self.beats = [0.0]
+        self.starts = [0.0]
+        self.spb = [0.5]
+        for e in notes:
+            if isinstance(e,TempoEvent):
+                sec = self.starts[-1] + (e.time-self.beats[-1])*self.spb[-1]
+                if e.time == self.beats[-1]:
+                    self.spb[-1] = 60/e.bpm
+                else:
+                    self.beats.append(e.time)
+                    self.starts.append(sec)
+                    self.spb.append(60/e.bpm)
+
+    def seconds(self,beat):
+        k = bisect_right(self.beats,beat) - 1
+        return self.starts[k] + (beat-self.beats[k])*self.spb[k]
+
+    def beat(self,seconds):
+        k = max(bisect_right(self.starts,seconds) - 1,0)
+        return self.beats[k] + (seconds-self.starts[k])/self.spb[k]
+
+def quantizeMidi(midi,grid=SERVER_TICK,subdivision=None,maxNps=None):
+    # Snaps midi.notes and midi.events in place, re-merges chords and returns a report dict
+    before = predict(midi.notes)
+    tempoMap = TempoMap(midi.notes)
+    if subdivision:
+        snap = lambda t: round(t*subdivision)/subdivision
+        step = lambda t: t + 1/subdivision
+    else:
+        snap = lambda t: tempoMap.beat(round(tempoMap.seconds(t)/grid)*grid)
+        step = lambda t: tempoMap.beat(tempoMap.seconds(t) + grid)
+
+    cache = {}
+    def snapped(t):
+        s = cache.get(t)
+        if s is None:
+            s = cache[t] = snap(t)
+        return s
+    for e in midi.notes:
+        if not isinstance(e,TempoEvent):
+            e.time = snapped(e.time)
+    midi.events = snapEvents(midi.events,snapped,step)
+
+    #Tempo, then presses, then releases at equal times: presses stay next to each other for the merge
+    #and a note snapped to zero length is pressed before it is released
+    midi.notes.sort(key=lambda e: (e.time,0 if isinstance(e,TempoEvent) else 2 if isinstance(e,ReleaseEvent) else 1))
+    midi.clean_notes()
+
+    thinned = 0
+    if maxNps:
+        thinned = thin(midi.notes,tempoMap,maxNps)
+
+    after = predict(midi.notes)
+    report = {k: before[k] - after[k] for k in ("timeQ","posQ","notes","enemTime","enemPos","lines")}
+    report["thinned"] = thinned
+    return report
+
+def snapEvents(events,snapped,step):
+    # Snaps the (time, key, velocity) events, a release that would land on or before the
+    # snapped onset of its note (paired like durations.pairDurations) moves one step after it
+    times = [snapped(t) for t,_,_ in events]
+    held = {}
+    for i in sorted(range(len(events)),key=lambda i: (events[i][0],events[i][2] > 0)):
+        _,k,v = events[i]
+        if v > 0:
+            held.setdefault(k,[]).append(i)
+            continue
+        stack = held.get(k)
+        if stack:
+            j = stack.pop()
+            if times[i] <= times[j]:
+                times[i] = step(times[j])
+    return [(times[i],k,v) for i,(_,k,v) in enumerate(events)]
+
+def thin(notes,tempoMap,maxNps):
+    # Drops chords while more than maxNps were kept in the last second
+    window = deque()
+    keep = []
+    dropped = 0
+    for e in notes:
+        if isinstance(e,(TempoEvent,ReleaseEvent)):
+            keep.append(e)
+            continue
+        sec = tempoMap.seconds(e.time)
+        while window and sec - window[0] >= 1.0:
+            window.popleft()
+        if len(window) < maxNps:
+            window.append(sec)
+            keep.append(e)
+        else:
+            dropped += 1
+    notes[:] = keep
+    return dropped
+
+def printReport(report):
+    print("Quantize saved timeQ %d, posQ %d, notes %d, enemTime %d, enemPos %d, %d workshop lines (%d chords thinned)" % (
+        report["timeQ"],report["posQ"],report["notes"],report["enemTime"],report["enemPos"],report["lines"],report["thinned"]))
+    return
@@ -0,0 +1,172 @@
+from noteColumns import keyToScale, virtualPianoScale
+from noteEvents import NoteEvent, ReleaseEvent, TempoEvent
+
+
+# Hardened MIDI decoding for files we did not make (community uploads).
+# MidiFile.readEvents scans for chunk signatures and trusts every length it
+# reads; decode walks the chunks by their declared lengths instead, checks
+# every read against the end of its chunk and keeps to the size and count
+# limits below, so time and memory stay linear in the file size.
+#
+# A track with a corrupt event (over long variable length, data byte where a
+# status is expected, event running past the chunk end) is dropped as a whole
+# and decoding carries on with the next chunk. Limits and a missing header are
+# fatal and raise MidiError.
+
+
+class MidiError(Exception):
+    pass
+
+
+class Limits:
+
+    def __init__(self,maxBytes=16*1024*1024,maxTracks=1024,maxEvents=1000000,maxTick=2**31):
+        self.maxBytes = maxBytes        # file size
+        self.maxTracks = maxTracks      # MTrk chunks decoded
+        self.maxEvents = maxEvents      # note and tempo events kept over all tracks
+        self.maxTick = maxTick          # absolute tick of any event
+
+
+class CorruptTrack(Exception):
+    pass
+
+def _varLen(data,p,end):
+    # At most 4 bytes (28 bits) as the spec says
+    value = 0
+    for k in range(4):
+        if p >= end:
+            raise CorruptTrack("variable length runs past the chunk end")
+        b = data[p]
+        p += 1
+        value = (value << 7) | (b & 0x7F)
+        if b < 0x80:
+            return value,p
+    raise CorruptTrack("variable length longer than 4 bytes")
+
+def _track(data,p,end,division,limits,budget):
+    # Decodes one MTrk body into (notes, events), raises CorruptTrack
+    notes = []
+    events = []
+    tick = 0
+    running = -1
+    while p < end:
+        delta,p = _varLen(data,p,end)
+        tick += delta
+        if tick > limits.maxTick:
+            raise CorruptTrack("event past tick %d" % limits.maxTick)
+        if p >= end:
+            raise CorruptTrack("delta time without an event")
+        status = data[p]
+        if status >= 0x80:
+            p += 1
+        elif running == -1:
+            raise CorruptTrack("data byte 0x%02X without running status" % status)
+        else:
+            status = running
+        if status == 0xFF:
+            if p >= end:
+                raise CorruptTrack("meta event without a type")
+            type = data[p]
+            length,p = _varLen(data,p+1,end)
+            if length > end - p:
+                raise CorruptTrack("meta event 0x%02X runs past the chunk end" % type)
+            if type == 0x2F:
+                break
+            if type == 0x51 and length == 3:
+                usec = int.from_bytes(data[p:p+3],"big")
+                if usec:
+                    notes.append(TempoEvent(tick/division,round(60000000/usec)))
+            # Text and other meta events are skipped whole, never copied
+            p += length
+        elif status == 0xF0 or status == 0xF7:
+            length,p = _varLen(data,p,end)
+            if length > end - p:
+                raise CorruptTrack("sysex runs past the chunk end")
+            p += length
+            running = -1
+        elif status > 0xF0:
+            raise CorruptTrack("system message 0x%02X in a track" % status)
+        else:
+            running = status
+            size = 1 if status >> 4 in (0xC,0xD) else 2
+            if size > end - p:
+                raise CorruptTrack("voice event runs past the chunk end")
+            for k in range(size):
+                if data[p+k] >= 0x80:
+                    raise CorruptTrack("status byte 0x%02X inside a voice event" % data[p+k])
+            kind = status >> 4
+            if kind == 0x9 or kind == 0x8:
+                key = data[p]
+                velocity = data[p+1] if kind == 0x9 else 0
+                name = virtualPianoScale[keyToScale(key)]
+                if velocity == 0:
+                    notes.append(ReleaseEvent(tick/division,name))
+                else:
+                    notes.append(NoteEvent(tick/division,name))
+                events.append((tick/division,key,velocity))
+            p += size
+        if len(notes) > budget:
+            raise MidiError("more than %d events" % limits.maxEvents)
+    return notes,events
+
+def decode(data,limits=None):
+    # Returns (format, tracks, division, notes, events, errors), errors lists what was skipped
+    limits = limits or Limits()
+    if len(data) > limits.maxBytes:
+        raise MidiError("file larger than %d bytes" % limits.maxBytes)
+    start = data.find(b"MThd",0,1024)
+    if start == -1 or start + 14 > len(data):
+        raise MidiError("no MThd header")
+    headerLength = int.from_bytes(data[start+4:start+8],"big")
+    if headerLength < 6:
+        raise MidiError("MThd header of %d bytes" % headerLength)
+    format = int.from_bytes(data[start+8:start+10],"big")
+    division = int.from_bytes(data[start+12:start+14],"big") & 0x7FFF
+    if division == 0:
+        raise MidiError("division of 0 ticks per beat")
+
+    notes = []
+    events = []
+    errors = []
+    tracks = 0
+    p = start + 8 + headerLength
+    while p + 8 <= len(data):
+        chunk = bytes(data[p:p+4])
+        length = int.from_bytes(data[p+4:p+8],"big")
+        body = p + 8
+        if not chunk.isalpha():
+            # Lost sync, carry on at the next track signature
+            found = data.find(b"MTrk",p+1)
+            errors.append("garbage at byte %d, %s" % (p,"resumed at %d" % found if found != -1 else "rest of the file skipped"))
+            if found == -1:
+                break
+            p = found
+            continue
+        end = body + length
+        if end > len(data):
+            errors.append("%s at byte %d truncated by %d bytes" % (chunk.decode("latin-1"),p,end - len(data)))
+            end = len(data)
+        p = end
+        if chunk != b"MTrk":
+            continue
+        tracks += 1
+        if tracks > limits.maxTracks:
+            raise MidiError("more than %d tracks" % limits.maxTracks)
+        try:
+            trackNotes,trackEvents = _track(data,body,end,division,limits,limits.maxEvents - len(notes))
+        except CorruptTrack as e:
+            errors.append("track %d at byte %d skipped: %s" % (tracks,body - 8,e))
+            continue
+        notes.extend(trackNotes)
+        events.extend(trackEvents)
+    return format,tracks,division,notes,events,errors
+
+def readSafe(midi,limits=None):
+    # Fills a MidiFile from midi.bytes the way readEvents does
+    midi.format,midi.tracks,midi.division,midi.notes,midi.events,midi.errors = decode(midi.bytes,limits)
+    midi.key_press_count = sum(1 for _,_,v in midi.events if v > 0)
+    if not midi.keepEvents:
+        midi.events = []
+    for e in midi.errors:
+        print("Warning:",e)
+    return
@@ -0,0 +1,232 @@
+import argparse
+import contextlib
+import io
+import math
+import sys
+import time
+from collections import Counter
+
+from emitters import walk
+from quantize import SERVER_TICK
+
+
+# Offline playback of the generated workshop arrays on the 60 Hz server clock.
+# The SONG PART (timeQ/posQ/notes), SONG PHRASES, SONG PACK and ENEMY PART
+# (enemTime/enemPos/enemHold) rules are read back from the written files and
+# replayed the way the template does: every entry waits its delta after the
+# previous one and fires on the first server tick at or after that time. The
+# report gives the key presses and spawns per tick, the live enemies, the
+# worst tick and second, and how far the written %2.4f deltas drift from the
+# song (with the MIDI or the converted notes at hand).
+#
+#   python Source/simulate.py OW-Song.txt OW-Enem.txt [--midi mids/song.mid] [--ticks load.csv]
+
+APPEND = "Modify Global Variable ("
+TICKS = round(1/SERVER_TICK)
+
+
+def readArrays(text):
+    # {name: [value text]} of every Append To Array line, plus the Global.x = n scalars
+    arrays = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith(APPEND):
+            name,_,value = line[len(APPEND):].partition(", Append To Array, ")
+            arrays.setdefault(name,[]).append(value[:-2])
+        elif line.startswith("Global.") and line[-1:] == ";":
+            name,_,value = line[7:-1].partition(" = ")
+            if value.isdigit():
+                arrays[name] = int(value)
+    return arrays
+
+def songTracks(arrays):
+    # [(label, [delta text], [notes])] of the songs in arrays, phrases and packs expanded
+    # as PHRASE EXPAND / PACK LOAD do
+    tracks = []
+    if "timeQ" in arrays:
+        tracks.append(("song",arrays["timeQ"],[int(n) for n in arrays["notes"]]))
+    if "phraseOrder" in arrays:
+        times = []
+        notes = []
+        for p in arrays["phraseOrder"]:
+            start = int(arrays["phraseStart"][int(p)])
+            end = start + int(arrays["phraseLen"][int(p)])
+            times += arrays["pTime"][start:end]
+            notes += [int(n) for n in arrays["pNotes"][start:end]]
+        tracks.append(("song",times,notes))
+    if "packEvent" in arrays:
+        k = arrays["packChords"]
+        for song,start in enumerate(arrays["packSongStart"]):
+            start = int(start)
+            events = [int(e) for e in arrays["packEvent"][start:start + int(arrays["packSongLen"][song])]]
+            tracks.append(("pack song %d" % song,[arrays["packTime"][e // k] for e in events],
+                           [int(arrays["packChordNotes"][e % k]) for e in events]))
+    return tracks
+
+def exactTimes(notes):
+    # Unrounded seconds since the previous chord of every chord of MidiFile.notes (owTimes of parseInfo)
+    return [c[0] for _,c in walk(notes) if c is not None]
+
+def drift(deltas,exact,enemies=False):
+    # (rounding, song) drift in seconds after every entry. rounding sums written - intended delta,
+    # song is the played time minus the chord's time in the song, so it also holds the chords
+    # SONG PART drops (every 100th) and the -0.033 of ENEMY PART
+    music = []
+    t = 0.0
+    for d in exact:
+        t += d
+        music.append(t)
+    rounding = []
+    song = []
+    r = played = 0.0
+    for i,d in enumerate(deltas):
+        k = i if enemies else i + i // 99
+        if k >= len(exact):
+            break
+        intended = exact[k]
+        if enemies and k % 100 in (49,99):
+            intended -= 0.033
+        d = float(d)
+        r += d - intended
+        played += d
+        rounding.append(r)
+        song.append(played - music[k])
+    return rounding,song
+
+def fireTicks(deltas):
+    # Server tick of every entry, each waits its delta after the previous one
+    ticks = []
+    t = 0.0
+    for d in deltas:
+        t += float(d)
+        ticks.append(math.ceil(t*TICKS - 1e-6))
+    return ticks
+
+def simulate(deltas=(),notes=(),enemies=(),holds=None,life=1.0):
+    # Replays one song and its enemies, an enemy is alive for life seconds (its enemHold if longer)
+    keys = Counter()
+    spawns = Counter()
+    change = Counter()
+    for tick,n in zip(fireTicks(deltas),notes):
+        keys[tick] += min(n,6)
+    for i,tick in enumerate(fireTicks(enemies)):
+        spawns[tick] += 1
+        change[tick] += 1
+        hold = max(float(holds[i]),life) if holds else life
+        change[tick + max(1,math.ceil(hold*TICKS - 1e-6))] -= 1
+
+    rows = []   # (tick, key presses, spawns, live enemies)
+    live = 0
+    peak = (0,0)
+    for tick in sorted(set(keys) | set(spawns) | set(change)):
+        live += change[tick]
+        if live > peak[0]:
+            peak = (live,tick)
+        rows.append((tick,keys[tick],spawns[tick],live))
+
+    #Busiest tick and busiest second (TICKS ticks) by key presses + spawns
+    burst = (0,0)
+    second = (0,0)
+    window = 0
+    first = 0
+    for tick,n,s,_ in rows:
+        if n + s > burst[0]:
+            burst = (n + s,tick)
+        window += n + s
+        while rows[first][0] <= tick - TICKS:
+            window -= rows[first][1] + rows[first][2]
+            first += 1
+        if window > second[0]:
+            second = (window,rows[first][0])
+    active = sum(1 for r in rows if r[1] or r[2])
+    return {
+        "rows": rows,
+        "ticks": rows[-1][0] + 1 if rows else 0,
+        "activeTicks": active,
+        "keys": sum(keys.values()),
+        "spawns": sum(spawns.values()),
+        "maxKeys": max(keys.values(),default=0),
+        "maxSpawns": max(spawns.values(),default=0),
+        "peakLive": peak,
+        "burst": burst,
+        "burstSecond": second,
+        "loads": dict(sorted(Counter(r[1] + r[2] for r in rows if r[1] or r[2]).items())),
+    }
+
+def driftReport(label,rounding,song):
+    if not rounding:
+        return
+    worst = max(song,key=abs)
+    print("  %s drift: %+.2f ms from rounding (worst %+.2f ms), %+.1f ms against the song at the end (worst %+.1f ms)" % (
+        label,rounding[-1]*1000,max(rounding,key=abs)*1000,song[-1]*1000,worst*1000))
+    return
+
+def printReport(name,info):
+    print("\n" + name)
+    print("  %d ticks (%.1f s), %d with presses or spawns" % (info["ticks"],info["ticks"]/TICKS,info["activeTicks"]))
+    print("  %d key presses (at most %d in a tick), %d spawns (at most %d in a tick)" % (
+        info["keys"],info["maxKeys"],info["spawns"],info["maxSpawns"]))
+    if info["spawns"]:
+        print("  peak %d live enemies at %.2f s" % (info["peakLive"][0],info["peakLive"][1]/TICKS))
+    print("  worst tick %d presses + spawns at %.2f s, worst second %d from %.2f s" % (
+        info["burst"][0],info["burst"][1]/TICKS,info["burstSecond"][0],info["burstSecond"][1]/TICKS))
+    print("  load per active tick " + "  ".join("%d:%d" % kv for kv in info["loads"].items()))
+    return
+
+def writeTicks(path,info):
+    with open(path,"w") as f:
+        f.write("tick,seconds,keys,spawns,live\n")
+        for tick,n,s,live in info["rows"]:
+            f.write("%d,%.4f,%d,%d,%d\n" % (tick,tick/TICKS,n,s,live))
+    return
+
+def simulateFiles(paths,exact=None,life=1.0,ticks=None):
+    # Reads the workshop outputs in paths and prints a report per song, a single song is played
+    # with the enemies; exact (see exactTimes) adds the drift lines
+    arrays = {}
+    for path in paths:
+        with open(path) as f:
+            arrays.update(readArrays(f.read()))
+    tracks = songTracks(arrays)
+    enemies = arrays.get("enemTime",[])
+    holds = arrays.get("enemHold")
+    if len(tracks) > 1 or not tracks:
+        runs = [(label,deltas,notes,(),None) for label,deltas,notes in tracks]
+        if enemies:
+            runs.append(("enemies",(),(),enemies,holds))
+    else:
+        label,deltas,notes = tracks[0]
+        runs = [(label + (" and enemies" if enemies else ""),deltas,notes,enemies,holds)]
+    for label,deltas,notes,enems,hold in runs:
+        info = simulate(deltas,notes,enems,hold,life)
+        printReport(label,info)
+        if exact is not None and len(tracks) <= 1:
+            driftReport("song",*drift(deltas,exact))
+            driftReport("enemy",*drift(enems,exact,True))
+        if ticks:
+            writeTicks(ticks if len(runs) == 1 else "%s.%s" % (ticks,label.replace(" ","-")),info)
+    return
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files",nargs="+",help="OW-Song.txt, OW-Enem.txt or OW-Pack.txt")
+    parser.add_argument("--midi",help="the song's MIDI file, for the drift against the unrounded times")
+    parser.add_argument("--life",type=float,default=1.0,help="seconds an enemy stays alive (default 1, enemHold when longer)")
+    parser.add_argument("--ticks",help="also write the load of every tick as CSV")
+    args = parser.parse_args()
+    exact = None
+    if args.midi:
+        from getSongNotes import MidiFile
+        with contextlib.redirect_stdout(io.StringIO()):
+            midi = MidiFile(args.midi,midi_dir="")
+        if not midi.success or not midi.notes:
+            print("Could not read",args.midi)
+            return 1
+        exact = exactTimes(midi.notes)
+    start = time.perf_counter()
+    simulateFiles(args.files,exact,args.life,args.ticks)
+    print("\nsimulated in %.3f s" % (time.perf_counter() - start))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+from bisect import bisect_left
+
+from noteColumns import np
+
+
+# Melody (skyline) extraction: one note per onset so a full piano MIDI
+# can feed getBots without exporting a treble-only copy from MuseScore.
+#   voice  0 = highest note of the onset, 1 = second highest, -1 = lowest
+#   split  only keys >= split are considered (hand split, 60 = middle C)
+#   minGap onsets closer than this many seconds to the last kept one are dropped
+
+def skyline(columns,voice=0,minGap=0.0,split=None):
+    if np is None:
+        return _skylinePy(columns,voice,minGap,split)
+    idx = np.flatnonzero(columns.velocities > 0)
+    if split is not None:
+        idx = idx[columns.keys[idx] >= split]
+    if len(idx) == 0:
+        return idx
+    times = columns.times[idx]
+    #Sort by time then by descending key so every onset group starts with its top note
+    order = np.lexsort((-columns.keys[idx],times))
+    idx = idx[order]
+    times = times[order]
+    starts = np.flatnonzero(np.concatenate(([True],times[1:] != times[:-1])))
+    sizes = np.diff(np.append(starts,len(idx)))
+    if voice >= 0:
+        pick = starts + np.minimum(voice,sizes-1)
+    else:
+        pick = starts + np.maximum(sizes+voice,0)
+    picked = idx[pick]
+    if minGap > 0:
+        picked = picked[_gapFilter(columns.seconds(columns.times[picked]),minGap)]
+    return picked
+
+def _gapFilter(seconds,minGap):
+    #Greedy: jump straight to the first onset at least minGap after the last kept one
+    seconds = seconds.tolist()
+    keep = []
+    i = 0
+    while i < len(seconds):
+        keep.append(i)
+        i = max(bisect_left(seconds,seconds[i]+minGap),i+1)
+    return np.array(keep,dtype=np.int64)
+
+def _skylinePy(columns,voice,minGap,split):
+    groups = {}
+    for i in range(len(columns)):
+        if columns.velocities[i] > 0 and (split is None or columns.keys[i] >= split):
+            groups.setdefault(columns.times[i],[]).append(i)
+    picked = []
+    for t in sorted(groups):
+        group = sorted(groups[t], key=lambda i: -columns.keys[i])
+        if voice >= 0:
+            picked.append(group[min(voice,len(group)-1)])
+        else:
+            picked.append(group[max(len(group)+voice,0)])
+    if minGap > 0:
+        seconds = columns.seconds([columns.times[i] for i in picked])
+        kept = []
+        last = None
+        for i,s in zip(picked,seconds):
+            if last is None or s - last >= minGap:
+                kept.append(i)
+                last = s
+        picked = kept
+    return picked
+
+def skylineNotes(columns,voice=0,minGap=0.0,split=None):
+    return columns.toNotes(skyline(columns,voice,minGap,split))
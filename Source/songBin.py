@@ -0,0 +1,178 @@
+import mmap
+import struct
+import sys
+
+from noteColumns import np
+from noteEvents import Chord, NoteEvent, ReleaseEvent, TempoEvent, fromText
+
+
+# Binary replacement for song.txt (version 1, little endian)
+#
+#   header  "OWSB" | version u16 | reserved u16 | playback_speed f64 | count u32 | blob size u32
+#   records count * (time f64 | info u32)   info = kind (2 bits) | length (6 bits) | value (24 bits)
+#   blob    note characters of every KEYS/RELEASE record, value is the offset into it
+#
+# TEMPO records keep the bpm in value. Every record is 12 bytes so record i
+# sits at HEADER.size + 12*i and the file can be memory mapped for random access.
+
+MAGIC = b"OWSB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHdII")
+RECORD = struct.Struct("<dI")
+
+KEYS = 0
+RELEASE = 1
+TEMPO = 2
+
+MAX_LENGTH = 0x3F       # 6 bit length field
+MAX_VALUE = 0xFFFFFF    # 24 bit value field (bpm or blob offset)
+
+if np is not None:
+    recordDtype = np.dtype([("time","<f8"),("info","<u4")])
+
+def encode(notes,playback_speed=1.0):
+    records = []
+    blob = []
+    blobSize = 0
+    pack = RECORD.pack
+    for time,note in notes:
+        if "tempo" in note:
+            bpm = int(note.split("=")[1])
+            if not 0 <= bpm <= MAX_VALUE:
+                raise ValueError("tempo %d at %s does not fit a song record" % (bpm,time))
+            records.append(pack(time,TEMPO | bpm << 8))
+            continue
+        if note[0] == "~":
+            kind = RELEASE
+            note = note[1:]
+        else:
+            kind = KEYS
+        data = note.encode("latin-1")
+        if len(data) > MAX_LENGTH:
+            raise ValueError("chord of %d notes at %s, a song record holds at most %d" % (len(data),time,MAX_LENGTH))
+        if blobSize > MAX_VALUE:
+            raise ValueError("song has more than %d bytes of notes" % MAX_VALUE)
+        records.append(pack(time,kind | len(data) << 2 | blobSize << 8))
+        blob.append(data)
+        blobSize += len(data)
+    header = HEADER.pack(MAGIC,VERSION,0,playback_speed,len(records),blobSize)
+    return header + b"".join(records) + b"".join(blob)
+
+def writeSong(song_file,notes,playback_speed=1.0):
+    print("Saving notes to",song_file)
+    data = encode(notes,playback_speed)
+    with open(song_file,"wb") as f:
+        f.write(data)
+    return
+
+
+class SongReader:
+    # Memory mapped view of a binary song, rows come back as noteEvents like readSong
+
+    def __init__(self,song_file):
+        with open(song_file,"rb") as f:
+            self.map = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        magic,version,_,self.playback_speed,self.count,blobSize = HEADER.unpack_from(self.map,0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(song_file + " is not a binary song file")
+        if version > VERSION:
+            self.close()
+            raise ValueError("%s uses song format version %d, this build reads up to %d" % (song_file,version,VERSION))
+        self.blobStart = HEADER.size + RECORD.size*self.count
+        if len(self.map) < self.blobStart + blobSize:
+            self.close()
+            raise ValueError(song_file + " is truncated")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self,i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self._row(RECORD.unpack_from(self.map,HEADER.size + RECORD.size*i))
+
+    def __iter__(self):
+        row = self._row
+        for record in RECORD.iter_unpack(self.map[HEADER.size:self.blobStart]):
+            yield row(record)
+
+    def _row(self,record):
+        return _event(self.map,self.blobStart,*record)
+
+    def records(self):
+        #Zero copy structured array over the record table (NumPy only)
+        return np.frombuffer(self.map,dtype=recordDtype,count=self.count,offset=HEADER.size)
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+def readSong(song_file):
+    with open(song_file,"rb") as f:
+        data = f.read()
+    magic,version,_,playback_speed,count,blobSize = HEADER.unpack_from(data,0)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(song_file + " is not a readable binary song file")
+    blobStart = HEADER.size + RECORD.size*count
+    if len(data) < blobStart + blobSize:
+        raise ValueError(song_file + " is truncated")
+    notes = []
+    for time,info in RECORD.iter_unpack(data[HEADER.size:blobStart]):
+        notes.append(_event(data,blobStart,time,info))
+    return playback_speed,notes
+
+def _event(data,blobStart,time,info):
+    kind,length,value = info & 3,(info >> 2) & 0x3F,info >> 8
+    if kind == TEMPO:
+        return TempoEvent(time,value)
+    start = blobStart + value
+    note = data[start:start+length].decode("latin-1")
+    if kind == RELEASE:
+        return ReleaseEvent(time,note)
+    if length > 1:
+        return Chord(time,note)
+    return NoteEvent(time,note)
+
+def readText(song_file):
+    with open(song_file,"r") as f:
+        lines = f.read().split("\n")
+    playback_speed = float(lines[0].split("=")[1])
+    notes = []
+    for l in lines[1:]:
+        l = l.split(" ")
+        if(len(l) < 2):
+            continue
+        notes.append(fromText(float(l[0]),l[1]))
+    return playback_speed,notes
+
+def writeText(song_file,notes,playback_speed=1.0):
+    with open(song_file,"w") as f:
+        f.write("playback_speed=" + str(playback_speed) + "\n")
+        f.write("".join(str(l[0]) + " " + str(l[1]) + "\n" for l in notes))
+    return
+
+def main():
+    # python songBin.py song.txt song.owsb   (text -> binary)
+    # python songBin.py song.owsb song.txt   (binary -> text)
+    if len(sys.argv) != 3:
+        print("usage: songBin.py <in> <out>, .txt on either side selects the legacy text format")
+        return 1
+    src,dst = sys.argv[1],sys.argv[2]
+    if src.endswith(".txt"):
+        playback_speed,notes = readText(src)
+        writeSong(dst,notes,playback_speed)
+    else:
+        playback_speed,notes = readSong(src)
+        writeText(dst,notes,playback_speed)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
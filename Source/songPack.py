@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from analyze import ARRAY_LIMIT, LINE_LIMIT, RULE_LINES
+from emitters import walk
+from phrases import songTokens
+from workshopWriter import POS_LINES, RULE_HEAD, RULE_TAIL, writeAtomic
+
+
+# Song pack builder. Several songs go into one workshop with every distinct
+# time value and every distinct chord stored once in shared tables:
+#
+#   packTime                 distinct time values
+#   packPos/packChordPos     posQ entries of every distinct chord and the first one of each chord
+#   packChordNotes           notes value of every distinct chord
+#   packEvent                timeId * Global.packChords + chordId for every chord of every song
+#   packSongStart/packSongLen  range of each song in packEvent
+#
+# Set Global.packSong and call the packLoad subroutine to rebuild timeQ, posQ
+# and notes for that song, the rest of the template reads them as usual.
+#   python Source/songPack.py mids/a.mid mids/b.mid ... [--out OW-Pack.txt]
+
+PER_RULE = 100
+
+PTIME_LINE = "\t\tModify Global Variable (packTime, Append To Array, %s);\n"
+CHORD_LINES = ("\t\tModify Global Variable (packChordPos, Append To Array, %d);\n"
+               "\t\tModify Global Variable (packChordNotes, Append To Array, %d);\n")
+EVENT_LINE = "\t\tModify Global Variable (packEvent, Append To Array, %d);\n"
+SONG_LINES = ("\t\tModify Global Variable (packSongStart, Append To Array, %d);\n"
+              "\t\tModify Global Variable (packSongLen, Append To Array, %d);\n")
+CHORDS_LINE = "\t\tGlobal.packChords = %d;\n"
+PACK_POS_LINES = {c: line.replace("(posQ,","(packPos,") for c,line in POS_LINES.items()}
+
+LOAD_RULE = """rule("PACK LOAD")
+{
+\tevent
+\t{
+\t\tSubroutine;
+\t\tpackLoad;
+\t}
+
+\tactions
+\t{
+\t\tGlobal.timeQ = Empty Array;
+\t\tGlobal.posQ = Empty Array;
+\t\tGlobal.notes = Empty Array;
+\t\tFor Global Variable(packI, Global.packSongStart[Global.packSong], Global.packSongStart[Global.packSong] + Global.packSongLen[Global.packSong], 1);
+\t\t\tGlobal.packT = Round To Integer(Global.packEvent[Global.packI] / Global.packChords, Down);
+\t\t\tGlobal.packC = Global.packEvent[Global.packI] - Global.packT * Global.packChords;
+\t\t\tModify Global Variable(timeQ, Append To Array, Global.packTime[Global.packT]);
+\t\t\tFor Global Variable(packJ, 0, Min(Global.packChordNotes[Global.packC], 6), 1);
+\t\t\t\tModify Global Variable(posQ, Append To Array, Global.packPos[Global.packChordPos[Global.packC] + Global.packJ]);
+\t\t\tEnd;
+\t\t\tModify Global Variable(notes, Append To Array, Global.packChordNotes[Global.packC]);
+\t\t\tIf(Global.packI % 100 == 99);
+\t\t\t\tWait(0.016, Ignore Condition);
+\t\t\tEnd;
+\t\tEnd;
+\t}
+}
+
+"""
+
+
+class SongPack:
+
+    def __init__(self):
+        self.times = []         # distinct time texts
+        self.chords = []        # distinct chords
+        self.timeIds = {}
+        self.chordIds = {}
+        self.events = []        # (time id, chord id) of every song in turn
+        self.songs = []         # (name, start, length, plain lines)
+
+    def add(self,name,tokens):
+        start = len(self.events)
+        for time,chord in tokens:
+            t = self.timeIds.get(time)
+            if t is None:
+                t = self.timeIds[time] = len(self.times)
+                self.times.append(time)
+            c = self.chordIds.get(chord)
+            if c is None:
+                c = self.chordIds[chord] = len(self.chords)
+                self.chords.append(chord)
+            self.events.append((t,c))
+        # what SONG PART rules of this song alone would cost
+        plain = 2*len(tokens) + sum(min(len(c),6) for _,c in tokens) + RULE_LINES*-(-len(tokens) // 99)
+        self.songs.append((name,start,len(tokens),plain))
+
+    def chordPos(self):
+        offsets = [0]
+        for c in self.chords:
+            offsets.append(offsets[-1] + min(len(c),6))
+        return offsets[:-1]
+
+    def expand(self,song):
+        # Python reference of PACK LOAD, the (time text, chord) tokens of one song
+        _,start,length,_ = self.songs[song]
+        return [(self.times[t],self.chords[c]) for t,c in self.events[start:start+length]]
+
+    def sizes(self):
+        return {
+            "packTime": len(self.times),
+            "packPos": sum(min(len(c),6) for c in self.chords),
+            "packChordPos": len(self.chords),
+            "packChordNotes": len(self.chords),
+            "packEvent": len(self.events),
+            "packSongStart": len(self.songs),
+            "packSongLen": len(self.songs),
+        }
+
+def render(pack):
+    lines = [PTIME_LINE % t for t in pack.times]
+    lines += ["".join(PACK_POS_LINES[k] for k in c[:6]) for c in pack.chords]
+    lines += [CHORD_LINES % (p,len(c)) for p,c in zip(pack.chordPos(),pack.chords)]
+    k = max(len(pack.chords),1)
+    lines += [EVENT_LINE % (t*k + c) for t,c in pack.events]
+    lines += [SONG_LINES % (start,length) for _,start,length,_ in pack.songs]
+    out = []
+    write = out.append
+    part = 1
+    for i in range(0,len(lines),PER_RULE):
+        write(RULE_HEAD % ("SONG PACK",part))
+        if i == 0:
+            write(CHORDS_LINE % k)
+        write("".join(lines[i:i+PER_RULE]))
+        write(RULE_TAIL)
+        part += 1
+    write(LOAD_RULE)
+    return "".join(out)
+
+def loadSong(path):
+    # (path, SONG PART tokens) or (path, None) when the file can't be read
+    from getSongNotes import MidiFile
+    with contextlib.redirect_stdout(io.StringIO()):
+        midi = MidiFile(path,midi_dir="")
+    if not midi.success or not midi.notes:
+        return path,None
+    try:
+        chords = [c for _,c in walk(midi.notes) if c is not None]
+    except ValueError:
+        #No leading tempo, the converters can't place its chords either
+        return path,None
+    return path,songTokens([c[0] for c in chords],[c[1] for c in chords])
+
+def budgetReport(pack,text):
+    sizes = pack.sizes()
+    plain = sum(s[3] for s in pack.songs)
+    lines = text.count("\n\t\tModify") + text.count("\n\t\tGlobal.packChords")
+    lines += RULE_LINES * text.count("rule(\"SONG PACK")
+    print("%-4s %-60s %7s %7s" % ("song","file","chords","start"))
+    for i,(name,start,length,_) in enumerate(pack.songs):
+        print("%-4d %-60s %7d %7d" % (i,os.path.basename(name),length,start))
+    print("shared tables: %d of %d times and %d of %d chords are distinct" % (
+        len(pack.times),len(pack.events),len(pack.chords),len(pack.events)))
+    print("workshop lines %d packed against %d for the songs one by one (limit %d)" % (lines,plain,LINE_LIMIT))
+    over = [k for k,v in sizes.items() if v > ARRAY_LIMIT]
+    print("largest array %s %d (limit %d)" % (max(sizes,key=sizes.get),max(sizes.values()),ARRAY_LIMIT))
+    if over or lines > LINE_LIMIT:
+        print("OVER LIMIT: " + ", ".join(over + (["lines"] if lines > LINE_LIMIT else [])))
+    return
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_files",nargs="+")
+    parser.add_argument("--out",default="OW-Pack.txt",help="workshop rules of the pack")
+    parser.add_argument("--jobs",type=int,default=None,help="songs converted at once (default one per CPU)")
+    args = parser.parse_args()
+
+    pack = SongPack()
+    with ProcessPoolExecutor(args.jobs) as pool:
+        for path,tokens in pool.map(loadSong,args.midi_files):
+            if tokens is None:
+                print("Skipping",path,"(could not be parsed)")
+                continue
+            pack.add(path,tokens)
+    if not pack.songs:
+        return 1
+    text = render(pack)
+    print("Saving pack of",len(pack.songs),"songs to",args.out)
+    writeAtomic(args.out,text)
+    budgetReport(pack,text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
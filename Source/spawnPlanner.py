@@ -0,0 +1,113 @@
+import heapq
+import math
+import random
+import sys
+import time
+
+
+# Spawn planner for getBots. Keeps the enemies that are still alive in a
+# spatial hash (cells of minDistance on each side) so a candidate position is
+# checked against the 27 neighbouring cells only, and expires them from a heap
+# as the song time moves on. A spawn costs O(1) expected whatever the length
+# of the song.
+
+# Box getPosition spawns in
+ARENA = ((-95.5,-85.5),(10.7,14.0),(-46.12,-35.12))
+
+
+class SpawnPlanner:
+
+    def __init__(self,minDistance=1.5,life=1.0,tries=30,box=ARENA,rng=random):
+        self.minDistance = minDistance
+        self.life = life
+        self.tries = tries
+        self.box = box
+        self.rng = rng
+        self.cells = {}
+        self.expiry = []
+        self.crowded = 0    # spawns where no free spot was found
+        self.count = 0
+
+    def _cell(self,pos):
+        d = self.minDistance
+        return (math.floor(pos[0]/d),math.floor(pos[1]/d),math.floor(pos[2]/d))
+
+    def expire(self,now):
+        while self.expiry and self.expiry[0][0] <= now:
+            _,_,cell,pos = heapq.heappop(self.expiry)
+            live = self.cells[cell]
+            live.remove(pos)
+            if not live:
+                del self.cells[cell]
+
+    def nearest(self,pos):
+        # Distance to the closest live enemy in the neighbouring cells (minDistance if none)
+        cx,cy,cz = self._cell(pos)
+        best = self.minDistance
+        for dx in (-1,0,1):
+            for dy in (-1,0,1):
+                for dz in (-1,0,1):
+                    for p in self.cells.get((cx+dx,cy+dy,cz+dz),()):
+                        d = math.dist(pos,p)
+                        if d < best:
+                            best = d
+        return best
+
+    def place(self,now,preferred=None,life=None):
+        # Position for an enemy spawning at now (seconds), preferred is tried first
+        self.expire(now)
+        best,bestDist = None,-1.0
+        for k in range(self.tries + 1):
+            if k == 0 and preferred is not None:
+                pos = tuple(preferred)
+            elif k == 0:
+                continue
+            else:
+                pos = tuple(round(self.rng.uniform(lo,hi),2) for lo,hi in self.box)
+            d = self.nearest(pos)
+            if d >= self.minDistance:
+                best = pos
+                break
+            if d > bestDist:
+                best,bestDist = pos,d
+        else:
+            self.crowded += 1
+        cell = self._cell(best)
+        self.cells.setdefault(cell,[]).append(best)
+        self.count += 1
+        heapq.heappush(self.expiry,(now + (self.life if life is None else life),self.count,cell,best))
+        return best
+
+def planPositions(owTimes,planner,preferred=None,lives=None):
+    # owTimes are the gaps between enemies, preferred(i,last) gives the walk's own
+    # choice for enemy i so spread out songs keep their usual layout
+    now = 0.0
+    last = None
+    out = []
+    for i in range(len(owTimes)):
+        now += owTimes[i]
+        want = preferred(i,last) if preferred is not None else None
+        last = planner.place(now,want,None if lives is None else lives[i])
+        out.append(last)
+    return out
+
+def main():
+    # python spawnPlanner.py [enemies] [per second] [min distance]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    dist = float(sys.argv[3]) if len(sys.argv) > 3 else 1.5
+    rng = random.Random(1)
+    planner = SpawnPlanner(dist,rng=rng)
+    gaps = [rng.expovariate(rate) for _ in range(n)]
+    start = time.perf_counter()
+    positions = planPositions(gaps,planner)
+    took = time.perf_counter() - start
+    # brute force check of the live set at the end
+    live = [p for cell in planner.cells.values() for p in cell]
+    close = sum(1 for a in range(len(live)) for b in range(a) if math.dist(live[a],live[b]) < dist)
+    print("%d enemies in %.3f s (%.1f us each), %d crowded spawns, %d close pairs among %d live at the end" % (
+        len(positions),took,took/len(positions)*1e6,planner.crowded,close,len(live)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
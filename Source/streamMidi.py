@@ -0,0 +1,230 @@
+import argparse
+import heapq
+import os
+import sys
+import time
+import tracemalloc
+
+from noteColumns import keyToScale, virtualPianoScale
+from noteEvents import Chord, NoteEvent, ReleaseEvent, TempoEvent
+
+
+# Streaming conversion for MIDI files too large for MidiFile. Only the chunk
+# table is read up front; every track then decodes lazily from its own small
+# window of the file, heapq.merge interleaves the tracks by tick and
+# mergeChords does clean_notes' work on the fly, so the events reach the
+# emitters in MidiFile.notes order while memory stays at a few blocks per
+# track. Decoding follows safeMidi (chunks by declared length, bounds checked),
+# a corrupt track ends at the bad event with a warning.
+#
+#   python Source/streamMidi.py big.mid [--make EVENTS]
+
+BUDGET = 1024*1024      # read buffers over all tracks
+MIN_BLOCK = 4096
+MAX_BLOCK = 256*1024
+
+
+class TrackReader:
+    # Bytes start..end of f through a buffer of block bytes, f is shared by all tracks
+
+    def __init__(self,f,start,end,block):
+        self.f = f
+        self.pos = start        # file offset of buf[0]
+        self.end = end
+        self.block = block
+        self.buf = b""
+        self.p = 0
+
+    def atEnd(self):
+        return self.pos + self.p >= self.end
+
+    def _fill(self,n):
+        # At least n unread bytes in buf
+        rest = self.buf[self.p:]
+        self.pos += self.p
+        self.p = 0
+        at = self.pos + len(rest)
+        self.f.seek(at)
+        self.buf = rest + self.f.read(min(max(self.block,n - len(rest)),self.end - at))
+        if len(self.buf) < n:
+            raise EOFError("event runs past the end of the track")
+
+    def byte(self):
+        if self.p >= len(self.buf):
+            self._fill(1)
+        b = self.buf[self.p]
+        self.p += 1
+        return b
+
+    def read(self,n):
+        if self.p + n > len(self.buf):
+            self._fill(n)
+        data = self.buf[self.p:self.p+n]
+        self.p += n
+        return data
+
+    def skip(self,n):
+        left = len(self.buf) - self.p
+        if n <= left:
+            self.p += n
+            return
+        if self.pos + self.p + n > self.end:
+            raise EOFError("event runs past the end of the track")
+        self.pos += len(self.buf) + (n - left)
+        self.buf = b""
+        self.p = 0
+
+    def varLen(self):
+        value = 0
+        for k in range(4):
+            b = self.byte()
+            value = (value << 7) | (b & 0x7F)
+            if b < 0x80:
+                return value
+        raise EOFError("variable length longer than 4 bytes")
+
+def chunkTable(f):
+    # (division, [(start, end) of every MTrk body])
+    head = f.read(14)
+    if head[:4] != b"MThd" or len(head) < 14:
+        raise ValueError("no MThd header")
+    division = int.from_bytes(head[12:14],"big") & 0x7FFF
+    if division == 0:
+        raise ValueError("division of 0 ticks per beat")
+    size = f.seek(0,os.SEEK_END)
+    tracks = []
+    pos = 8 + int.from_bytes(head[4:8],"big")
+    while pos + 8 <= size:
+        f.seek(pos)
+        chunk = f.read(8)
+        start = pos + 8
+        pos = start + int.from_bytes(chunk[4:8],"big")
+        if chunk[:4] == b"MTrk":
+            tracks.append((start,min(pos,size)))
+        elif not chunk[:4].isalpha():
+            print("Warning: garbage at byte",start - 8,"rest of the file skipped")
+            break
+    return division,tracks
+
+def trackEvents(reader,division,number,names=None):
+    # Yields (tick, event) of one track in file order, names[number-1] gets the track's first name
+    tick = 0
+    running = -1
+    try:
+        while not reader.atEnd():
+            tick += reader.varLen()
+            status = reader.byte()
+            if status < 0x80:
+                if running == -1:
+                    raise EOFError("data byte without running status")
+                reader.p -= 1
+                status = running
+            if status == 0xFF:
+                type = reader.byte()
+                length = reader.varLen()
+                if type == 0x2F:
+                    return
+                if type == 0x51 and length == 3:
+                    usec = int.from_bytes(reader.read(3),"big")
+                    if usec:
+                        yield tick,TempoEvent(tick/division,round(60000000/usec))
+                elif type == 0x03 and names is not None and names[number-1] is None and length:
+                    names[number-1] = reader.read(length).decode("latin-1").strip()
+                else:
+                    reader.skip(length)
+            elif status == 0xF0 or status == 0xF7:
+                reader.skip(reader.varLen())
+                running = -1
+            elif status > 0xF0:
+                raise EOFError("system message 0x%02X in a track" % status)
+            else:
+                running = status
+                kind = status >> 4
+                if kind == 0x9 or kind == 0x8:
+                    key = reader.byte()
+                    velocity = reader.byte()
+                    if kind == 0x8:
+                        velocity = 0
+                    name = virtualPianoScale[keyToScale(key & 0x7F)]
+                    if velocity == 0:
+                        yield tick,ReleaseEvent(tick/division,name)
+                    else:
+                        yield tick,NoteEvent(tick/division,name)
+                else:
+                    reader.skip(1 if kind in (0xC,0xD) else 2)
+    except EOFError as e:
+        print("Warning: track",number,"ends early,",e)
+
+def streamEvents(f,block=None,names=None):
+    # Events of every track of the open file f merged by time, ties in track order like clean_notes' sort.
+    # A names list is filled with one entry per track, its name or None
+    division,tracks = chunkTable(f)
+    block = block or max(MIN_BLOCK,min(MAX_BLOCK,BUDGET // max(len(tracks),1)))
+    if names is not None:
+        names[:] = [None] * len(tracks)
+    streams = [trackEvents(TrackReader(f,start,end,block),division,i+1,names) for i,(start,end) in enumerate(tracks)]
+    for tick,e in heapq.merge(*streams,key=lambda x: x[0]):
+        yield e
+
+def _press(e):
+    return not isinstance(e,(TempoEvent,ReleaseEvent))
+
+def _dedupe(e):
+    if isinstance(e,Chord):
+        keys = "".join(dict.fromkeys(e.key))
+        if len(keys) != len(e.key):
+            e.key = keys
+    return e
+
+def mergeChords(events,counter=None):
+    # clean_notes as a stream: presses at one time next to each other become one chord,
+    # counter[0] counts the key presses
+    pending = None
+    for e in events:
+        if counter is not None and _press(e):
+            counter[0] += 1
+        if pending is not None and e.time == pending.time and _press(e) and _press(pending):
+            pending = Chord(pending.time,pending.key + e.key)
+            continue
+        if pending is not None:
+            yield _dedupe(pending)
+        pending = e
+    if pending is not None:
+        yield _dedupe(pending)
+
+def makeMidi(path,notes):
+    # Synthetic one track file of notes one beat long, for trying out large inputs
+    tempo = b"\x00\xff\x51\x03\x07\xa1\x20"
+    first = b"\x00\x90\x3c\x40"
+    step = b"\x83\x60\x3c\x00\x00\x3c\x40"    # release and press again one beat later (running status)
+    last = b"\x83\x60\x3c\x00\x00\xff\x2f\x00"
+    with open(path,"wb") as f:
+        f.write(b"MThd" + (6).to_bytes(4,"big") + b"\x00\x00\x00\x01\x01\xe0")
+        f.write(b"MTrk" + (len(tempo) + len(first) + len(step)*(notes-1) + len(last)).to_bytes(4,"big"))
+        f.write(tempo + first)
+        for k in range(0,notes-1,100000):
+            f.write(step * min(100000,notes-1-k))
+        f.write(last)
+    return
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_file")
+    parser.add_argument("--make",type=int,help="first write a synthetic file with this many notes to midi_file")
+    args = parser.parse_args()
+    if args.make:
+        makeMidi(args.midi_file,args.make)
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = 0
+    with open(args.midi_file,"rb") as f:
+        for e in mergeChords(streamEvents(f)):
+            count += 1
+    took = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%d rows from %.1f MB in %.2f s, peak %.2f MB" % (count,os.path.getsize(args.midi_file)/1024/1024,took,peak/1024/1024))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import io
+import math
+import sys
+
+from emitters import WorkshopSong, fanOut
+from noteColumns import NoteColumns, keyToScale, np, virtualPianoScale
+from noteEvents import NoteEvent, ReleaseEvent, TempoEvent
+from streamMidi import mergeChords
+
+
+# Song variants from one parse. The MIDI is read once into NoteColumns and
+# every variant (speed, transpose, difficulty) is a few array operations on
+# those columns, done for all variants at once as rows of 2D arrays:
+#   speed      playback speed, beat times are divided by it so seconds scale exactly
+#   transpose  semitones, folded by octaves into virtualPianoScale like readVoiceEvent does
+#   nps        at most one chord per 1/nps seconds (0 = all), the first chord of each slot is kept
+#   chord      keys kept per chord, highest first (0 = all)
+# Each variant is written as its own SONG PART output, OW-Song-<name>.txt.
+#
+#   python Source/variants.py mids/song.mid [--variant easy:level=easy,speed=0.8 ...]
+
+# level -> (nps, chord)
+LEVELS = {"easy": (4,1), "normal": (8,3), "hard": (0,0)}
+# A chord exactly on a slot edge can come out a hair below it, it belongs to the later slot
+SLOT_EPSILON = 1e-9
+
+
+class Variant:
+
+    def __init__(self,name,speed=1.0,transpose=0,nps=0,chord=0):
+        self.name = name
+        self.speed = speed
+        self.transpose = transpose
+        self.nps = nps
+        self.chord = chord
+
+    @classmethod
+    def parse(cls,spec):
+        # "name:speed=1.25,transpose=-12,level=easy,nps=6,chord=2", a bare level name works too
+        name,_,opts = spec.partition(":")
+        v = cls(name)
+        if name in LEVELS:
+            v.nps,v.chord = LEVELS[name]
+        for opt in filter(None,opts.split(",")):
+            k,_,value = opt.partition("=")
+            if k == "level":
+                v.nps,v.chord = LEVELS[value]
+            elif k in ("speed","nps"):
+                setattr(v,k,float(value))
+            elif k in ("transpose","chord"):
+                setattr(v,k,int(value))
+            else:
+                raise ValueError("unknown variant option '%s'" % k)
+        if not v.speed > 0:
+            raise ValueError("speed must be above 0, not %g" % v.speed)
+        if v.nps < 0:
+            raise ValueError("nps can't be negative")
+        return v
+
+def chordRank(times,keys):
+    # Position of every onset inside its chord, 0 for the highest key
+    if np is None:
+        rank = [0] * len(times)
+        groups = {}
+        for i in range(len(times)):
+            groups.setdefault(times[i],[]).append(i)
+        for group in groups.values():
+            for r,i in enumerate(sorted(group,key=lambda i: -keys[i])):
+                rank[i] = r
+        return rank
+    order = np.lexsort((-keys,times))
+    sortedTimes = times[order]
+    starts = np.flatnonzero(np.concatenate(([True],sortedTimes[1:] != sortedTimes[:-1])))
+    groupStart = np.repeat(starts,np.diff(np.append(starts,len(order))))
+    rank = np.empty(len(order),dtype=np.int64)
+    rank[order] = np.arange(len(order)) - groupStart
+    return rank
+
+def foldKeys(keys):
+    # virtualPianoScale index of every MIDI key, keyToScale on whole arrays
+    m = keys - 23 - 12 - 1
+    n = len(virtualPianoScale)
+    m = np.where(m >= n,m - 12*((m - n)//12 + 1),m)
+    return np.where(m < 0,m + 12*((-m - 1)//12 + 1),m)
+
+def batch(columns,variants):
+    # [(times, scale indexes, onset flags, tempo times)] of every variant, the kept rows only
+    if np is None:
+        return [_variantPy(columns,v) for v in variants]
+    speeds = np.array([v.speed for v in variants],dtype=np.float64)
+    shifts = np.array([v.transpose for v in variants],dtype=np.int64)
+    nps = np.array([v.nps for v in variants],dtype=np.float64)
+    chords = np.array([v.chord if v.chord > 0 else 1 << 30 for v in variants],dtype=np.int64)
+
+    onset = columns.velocities > 0
+    on = np.flatnonzero(onset)
+    onTimes = columns.times[on]
+    seconds = columns.seconds(onTimes)
+    rank = chordRank(onTimes,columns.keys[on].astype(np.int64))
+
+    #Slots of 1/nps seconds at the variant's speed, keep the onsets of the first chord in each slot
+    rate = np.where(nps > 0,nps/speeds,0.0)
+    slot = np.floor(seconds[None,:]*rate[:,None] + SLOT_EPSILON)
+    change = np.ones(slot.shape,dtype=bool)
+    change[:,1:] = slot[:,1:] != slot[:,:-1]
+    first = np.maximum.accumulate(np.where(change,np.arange(len(on))[None,:],0),axis=1)
+    keepOn = (onTimes[first] == onTimes[None,:]) | (nps <= 0)[:,None]
+    keepOn &= rank[None,:] < chords[:,None]
+
+    keep = np.ones((len(variants),len(columns)),dtype=bool)
+    keep[:,on] = keepOn
+    times = columns.times[None,:] / speeds[:,None]
+    scale = foldKeys(columns.keys[None,:].astype(np.int64) + shifts[:,None])
+    tempoTimes = np.asarray(columns.tempoTimes)[None,:] / speeds[:,None]
+    return [(times[k][keep[k]],scale[k][keep[k]],onset[keep[k]],tempoTimes[k]) for k in range(len(variants))]
+
+def _variantPy(columns,v):
+    onsets = [i for i in range(len(columns)) if columns.velocities[i] > 0]
+    onTimes = [columns.times[i] for i in onsets]
+    seconds = columns.seconds(onTimes)
+    rank = chordRank(onTimes,[columns.keys[i] for i in onsets])
+    keep = set()
+    slot = None
+    chordTime = None
+    for k,i in enumerate(onsets):
+        if v.nps > 0:
+            s = math.floor(seconds[k]*(v.nps/v.speed) + SLOT_EPSILON)
+            if s != slot:
+                slot,chordTime = s,onTimes[k]
+            if onTimes[k] != chordTime:
+                continue
+        if v.chord > 0 and rank[k] >= v.chord:
+            continue
+        keep.add(i)
+    rows = [i for i in range(len(columns)) if columns.velocities[i] <= 0 or i in keep]
+    return ([columns.times[i] / v.speed for i in rows],
+            [keyToScale(columns.keys[i] + v.transpose) for i in rows],
+            [columns.velocities[i] > 0 for i in rows],
+            [t / v.speed for t in columns.tempoTimes])
+
+def variantNotes(columns,times,scale,onset,tempoTimes):
+    # MidiFile.notes of one variant: rows as NoteColumns.toNotes builds them, chords merged as clean_notes does
+    rows = [TempoEvent(float(t),int(b)) for t,b in zip(tempoTimes,columns.tempos)]
+    for t,s,o in zip(times,scale,onset):
+        if o:
+            rows.append(NoteEvent(float(t),virtualPianoScale[int(s)]))
+        else:
+            rows.append(ReleaseEvent(float(t),virtualPianoScale[int(s)]))
+    rows.sort(key=lambda r: (r.time, not isinstance(r,TempoEvent)))
+    while len(rows) > 1 and isinstance(rows[-1],TempoEvent):
+        rows.pop()
+    return list(mergeChords(rows))
+
+def main():
+    from getSongNotes import MidiFile
+    parser = argparse.ArgumentParser()
+    parser.add_argument("midi_file")
+    parser.add_argument("--variant",action="append",metavar="NAME[:OPTIONS]",help="e.g. easy, fast:speed=1.25 or low:transpose=-12,level=normal (default easy, normal and hard)")
+    args = parser.parse_args()
+    try:
+        variants = [Variant.parse(spec) for spec in (args.variant or ["easy","normal","hard"])]
+    except (KeyError,ValueError) as e:
+        parser.error("bad --variant: %s" % e)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        midi = MidiFile(args.midi_file,midi_dir="",keepEvents=True)
+    if not midi.success or not midi.events:
+        print("Could not read",args.midi_file)
+        return 1
+    columns = NoteColumns.fromMidi(midi)
+    for v,rows in zip(variants,batch(columns,variants)):
+        notes = variantNotes(columns,*rows)
+        chords = sum(1 for e in notes if not isinstance(e,(TempoEvent,ReleaseEvent)))
+        print("%s: speed %g, transpose %+d, %d chords" % (v.name,v.speed,v.transpose,chords))
+        fanOut(notes,[WorkshopSong("OW-Song-%s.txt" % v.name)])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import io
+import os
+import sys
+import tempfile
+
+
+# Workshop text for the SONG PART / ENEMY PART rules, rendered into one buffer
+# from precompiled format strings and written with a single I/O call.
+
+white = {'1':0, '2':1, '3':2, '4':3, '5':4, '6':5, '7':6, '8':7, '9':8, '0':9, 'q':10, 'w':11, 'e':12, 'r':13, 't':14, 'y':15, 'u':16, 'i':17, 'o':18, 'p':19,
+        'a':20, 's':21, 'd':22, 'f':23, 'g':24, 'h':25, 'j':26, 'k':27, 'l':28, 'z':29, 'x':30, 'c':31, 'v':32, 'b':33, 'n':34, 'm':35}
+black = {'!':0, '@':1, '$':2, '%':3, '^':4, '*':5, '(':6, 'Q':7, 'W':8, 'E':9, 'T':10, 'Y':11, 'I':12, 'O':13, 'P':14, 'S':15, 'D':16, 'G':17, 'H':18, 'J':19,
+        'L':20, 'Z':21, 'C':22, 'V':23, 'B':24}
+
+RULE_HEAD = "rule(\"%s %d\")\n{\n\tevent\n\t{\n\t\tOngoing - Global;\n\t}\n\n\tactions\n\t{\n"
+RULE_TAIL = "\t}\n}\n\n"
+TIME_LINE = "\t\tModify Global Variable (timeQ, Append To Array, %2.4f);\n"
+NOTES_LINE = "\t\tModify Global Variable (notes, Append To Array, %d);\n"
+ENEM_TIME_LINE = "\t\tModify Global Variable (enemTime, Append To Array, %2.4f);\n"
+ENEM_POS_LINE = "\t\tModify Global Variable (enemPos, Append To Array, %s);\n"
+NUM_ENEMS_LINE = "\t\tGlobal.numEnems = %d;\n"
+HOLD_LINE = "\t\tModify Global Variable (holdQ, Append To Array, %2.4f);\n"
+ENEM_HOLD_LINE = "\t\tModify Global Variable (enemHold, Append To Array, %2.4f);\n"
+
+# 0666 less the umask, the mode of a file made by open(path,"w")
+UMASK = os.umask(0)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+POS_LINES = {}
+for n,i in white.items():
+    POS_LINES[n] = "\t\tModify Global Variable (posQ, Append To Array, Global.wPiano[%d]);\n" % i
+for n,i in black.items():
+    POS_LINES[n] = "\t\tModify Global Variable (posQ, Append To Array, Global.bPiano[%d]);\n" % i
+
+# The README points at this line of template.txt when pasting by hand
+TEMPLATE_LINE = 442
+
+def renderSong(owTimes,owNotes,part=1,holds=None):
+    # Same layout as the original createOW: rule x holds notes (x-1)*100 .. (x-1)*100+98
+    # holds (seconds per note) adds a holdQ array for templates with hold notes
+    out = []
+    write = out.append
+    n = len(owNotes)
+    while part <= -(-n // 100):
+        write(RULE_HEAD % ("SONG PART",part))
+        base = (part-1)*100 - 1
+        for y in range(1,100):
+            if y + base < n:
+                note = owNotes[y + base]
+                write(TIME_LINE % owTimes[y + base])
+                for c in note[:6]:
+                    write(POS_LINES[c])
+                write(NOTES_LINE % len(note))
+                if holds is not None:
+                    write(HOLD_LINE % holds[y + base])
+        write(RULE_TAIL)
+        part += 1
+    return "".join(out)
+
+def renderEnemies(owTimes,positions,holds=None):
+    # positions[i] is the Vector(...) literal of enemy i, None leaves enemPos to the ENEMY POSITIONS rule
+    # holds (seconds per enemy) adds an enemHold array for how long each enemy should live
+    out = []
+    write = out.append
+    n = len(positions) if positions is not None else len(owTimes)
+    for part in range(n // 100 + 1):
+        write(RULE_HEAD % ("ENEMY PART",part))
+        for y in range(100):
+            i = y + part*100
+            if i < n:
+                if y == 99 or y == 49:
+                    write(ENEM_TIME_LINE % (float(owTimes[i]) - 0.033))
+                else:
+                    write(ENEM_TIME_LINE % owTimes[i])
+                if positions is not None:
+                    write(ENEM_POS_LINE % positions[i])
+                if holds is not None:
+                    write(ENEM_HOLD_LINE % holds[i])
+            if i == n:
+                write(NUM_ENEMS_LINE % n)
+        write(RULE_TAIL)
+    return "".join(out)
+
+def tempNear(path):
+    # (fd, temp path) next to path with the mode open(path,"w") would give, mkstemp makes it 0600
+    # and os.replace would keep that
+    fd,tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),prefix=".tmp-",suffix=os.path.basename(path))
+    os.chmod(tmp,FILE_MODE)
+    return fd,tmp
+
+def writeAtomic(path,text):
+    # Write to a temp file next to path then rename, readers never see a half written file
+    fd,tmp = tempNear(path)
+    try:
+        with os.fdopen(fd,"w") as f:
+            f.write(text)
+        os.replace(tmp,path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return
+
+def spliceTemplate(template_file,parts,marker=None):
+    # Streams template_file into a buffer and inserts parts at the line holding
+    # marker (the marker line is replaced) or, without a marker, before TEMPLATE_LINE
+    out = io.StringIO()
+    inserted = False
+    with open(template_file,"r") as f:
+        for lineNo,line in enumerate(f,1):
+            if not inserted:
+                if marker is not None and marker in line:
+                    out.writelines(parts)
+                    inserted = True
+                    continue
+                if marker is None and lineNo == TEMPLATE_LINE:
+                    out.writelines(parts)
+                    inserted = True
+            out.write(line)
+    if not inserted:
+        if marker is not None:
+            raise ValueError("marker '%s' not found in %s" % (marker,template_file))
+        out.writelines(parts)
+    return out.getvalue()
+
+def buildWorkshop(template_file,out_file,part_files,marker=None):
+    # Every part must exist, a leftover file of another song must not slip in by default
+    parts = []
+    for p in part_files:
+        if not os.path.exists(p):
+            raise FileNotFoundError("workshop part %s not found" % p)
+        with open(p,"r") as f:
+            parts.append(f.read())
+    print("Writing workshop code to",out_file)
+    writeAtomic(out_file,spliceTemplate(template_file,parts,marker))
+    return
+
+def main():
+    # python workshopWriter.py template.txt workshop.txt [OW-Song.txt OW-Enem.txt ...]
+    if len(sys.argv) < 3:
+        print("usage: workshopWriter.py <template> <out> [parts...]")
+        return 1
+    parts = sys.argv[3:] or ["OW-Song.txt","OW-Enem.txt"]
+    buildWorkshop(sys.argv[1],sys.argv[2],parts)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The converters are flat scripts in Source/, import them the way they import each other
+sys.path.insert(0,os.path.join(ROOT,"Source"))
+
+
+class Mids:
+    # The MIDI corpus of the repo, MidiFile loads without the parse log on stdout
+
+    def path(self,name="",folder="mids"):
+        # without a name, the folder itself
+        return os.path.normpath(os.path.join(ROOT,folder,name))
+
+    def load(self,name,folder="mids",**options):
+        import getSongNotes
+        with contextlib.redirect_stdout(io.StringIO()):
+            return getSongNotes.MidiFile(name,midi_dir=os.path.join(ROOT,folder),**options)
+
+@pytest.fixture
+def mids():
+    return Mids()
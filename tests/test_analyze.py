@@ -0,0 +1,30 @@
+import contextlib
+import io
+
+import pytest
+
+from analyze import convertErrors, predict, printReport
+from noteEvents import NoteEvent, TempoEvent
+
+
+@pytest.mark.parametrize("name,errors",[("Sweden_Minecraft.mid",[]),("I_REALLY_WANT_TO_STAY_AT_YOUR_HOUSE.mid",["trailing tempo row"]),
+                                        ("bach.mid",["trailing tempo row"])])
+def test_corpus_errors(name,errors,mids):
+    info = predict(mids.load(name).notes)
+    assert info["errors"] == errors
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        printReport(name,info)
+    assert ("CAN'T CONVERT" in out.getvalue()) == bool(errors)
+    assert ("fits" in out.getvalue()) != bool(errors)
+
+@pytest.mark.parametrize("notes,errors",[
+    ([],["no notes"]),
+    ([NoteEvent(0,"f"),NoteEvent(1,"g")],["no leading tempo"]),
+    # parseInfo pops a later tempo row and reads the two rows behind it
+    ([TempoEvent(0,120),NoteEvent(0,"f"),TempoEvent(1,90),NoteEvent(1,"g"),NoteEvent(2,"h")],[]),
+    ([TempoEvent(0,120),NoteEvent(0,"f"),NoteEvent(1,"g"),TempoEvent(2,90),NoteEvent(2,"h")],["trailing tempo row"]),
+    ([TempoEvent(0,120),NoteEvent(0,"f"),NoteEvent(1,"g"),TempoEvent(2,90)],["trailing tempo row"]),
+    ([TempoEvent(0,120),TempoEvent(0,90)],["trailing tempo row"]),
+])
+def test_convert_errors(notes,errors):
+    assert convertErrors(notes) == errors
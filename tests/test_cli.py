@@ -0,0 +1,56 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import getBots
+import getSongNotes
+
+
+@pytest.mark.parametrize("module,flags",[
+    (getSongNotes,["--phrases","--holds"]),
+    (getSongNotes,["--stream","--start","4"]),
+    (getSongNotes,["--stream","--quantize"]),
+    (getSongNotes,["--emit","sheet","--phrases"]),
+    (getBots,["--runtime-positions","--spread","2"]),
+    (getBots,["--stream","--skyline"]),
+    (getBots,["--emit","enemies","--spread","2"]),
+    (getSongNotes,["--start","40","--end","10"]),
+    (getBots,["--start","8","--end","8"]),
+    (getSongNotes,["--quantize","--grid","0"]),
+    (getSongNotes,["--quantize","--subdivision","0"]),
+    (getSongNotes,["--max-nps","6"]),
+    (getBots,["--quantize","--grid","-1"]),
+    (getBots,["--spread","-1"]),
+    (getBots,["--spread","0"]),
+    (getBots,["--quantize","--max-nps","0"]),
+])
+def test_conflicting_flags(module,flags,monkeypatch):
+    # rejected before the MIDI is looked at
+    monkeypatch.setattr(sys,"argv",["prog","missing.mid"] + flags)
+    with contextlib.redirect_stderr(io.StringIO()),pytest.raises(SystemExit) as e:
+        module.main()
+    assert e.value.code == 2
+
+@pytest.mark.parametrize("module,midi_dir",[(getSongNotes,"mids"),(getBots,"trebleMids")])
+def test_window_past_the_song(module,midi_dir,monkeypatch,tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    name = sorted(n for n in os.listdir(os.path.join(root,midi_dir)) if n.endswith(".mid"))[0]
+    os.symlink(os.path.join(root,midi_dir),tmp_path / midi_dir)
+    os.symlink(os.path.join(root,midi_dir,name),tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys,"argv",["prog",name,"--start","100000"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert module.main() == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([midi_dir,name])
+
+@pytest.mark.parametrize("script",["analyze.py","songBin.py","workshopWriter.py"])
+def test_usage_exit_code(script):
+    # main() returns 1 on a usage error, the exit code must carry it
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),"Source",script)
+    result = subprocess.run([sys.executable,path],capture_output=True,text=True)
+    assert result.returncode == 1
+    assert "usage" in result.stdout
@@ -0,0 +1,23 @@
+import contextlib
+import io
+import random
+
+import getBots
+import getSongNotes
+from emitters import fanOut
+
+
+def emit(mids,module,kinds,folder):
+    midi = mids.load("Fr_Elise.mid")
+    with contextlib.redirect_stdout(io.StringIO()):
+        random.seed(7)
+        fanOut(midi.notes,module.makeEmitters([k + "=" + str(folder / (k + ".txt")) for k in kinds]))
+    return {k: (folder / (k + ".txt")).read_text() for k in kinds}
+
+def test_both_converters_emit_every_format(tmp_path,mids):
+    notes = tmp_path / "notes"
+    bots = tmp_path / "bots"
+    notes.mkdir()
+    bots.mkdir()
+    kinds = ["song","sheet","workshop","enemies","json"]
+    assert emit(mids,getSongNotes,kinds,notes) == emit(mids,getBots,kinds,bots)
@@ -0,0 +1,101 @@
+import random
+import re
+
+import pytest
+
+from enemyWalk import AXES, RESET_TIME, enemyTimes, renderWalkRule, walkPositions
+
+EPS = 1e-9
+
+
+def song(rng,n=300):
+    # seconds since the previous enemy, mostly fast runs with a few pauses
+    return enemyTimes([rng.choice((rng.uniform(0.05,RESET_TIME),rng.uniform(0.0,0.2),rng.uniform(0.6,3.0))) for _ in range(n)])
+
+@pytest.mark.parametrize("seed",range(0,65536,4099))
+def test_positions_stay_in_bounds(seed):
+    times = song(random.Random(seed))
+    for i,(t,pos) in enumerate(zip(times,walkPositions(times,seed))):
+        for a,(name,spawn,step,limit,heads) in enumerate(AXES):
+            if i == 0 or t > RESET_TIME:
+                assert spawn[0] - EPS <= pos[a] <= spawn[1] + EPS, (name,i)
+            else:
+                assert limit[0] - EPS <= pos[a] <= limit[1] + EPS, (name,i)
+
+@pytest.mark.parametrize("seed",range(7,65536,4099))
+def test_steps_follow_the_timing(seed):
+    # an enemy soon after the last one moves one step of step range * 2t on every axis
+    # (t is negative where enemyTimes takes 0.033 s off a very short gap)
+    times = song(random.Random(seed))
+    positions = walkPositions(times,seed)
+    for i in range(1,len(times)):
+        t = times[i]
+        if t > RESET_TIME:
+            continue
+        for a,(name,spawn,step,limit,heads) in enumerate(AXES):
+            moved = abs(positions[i][a] - positions[i-1][a])
+            assert step[0]*2*abs(t) - EPS <= moved <= step[1]*2*abs(t) + EPS, (name,i)
+
+def test_seed_repeats_layout():
+    times = song(random.Random(1))
+    assert walkPositions(times,42) == walkPositions(times,42)
+    assert walkPositions(times,42) != walkPositions(times,43)
+
+
+def translate(rule):
+    # ENEMY POSITIONS rule text to Python, only the workshop subset renderWalkRule writes
+    body = rule[rule.index("actions"):]
+    body = body[body.index("{")+1:body.rindex("}")]
+    body = body[:body.rindex("}")]
+    src = []
+    depth = 0
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        line = line.rstrip(";")
+        line = line.replace("Global.","G.").replace("&&"," and ").replace("||"," or ")
+        line = line.replace("Count Of(","len(")
+        if line == "End":
+            depth -= 1
+            continue
+        if line == "Else":
+            src.append("    "*(depth-1) + "else:")
+            continue
+        m = re.match(r"For Global Variable\((\w+), (.*), (.*), 1\)$",line)
+        if m:
+            src.append("    "*depth + "for G.%s in range(%s, %s):" % m.groups())
+            depth += 1
+            continue
+        m = re.match(r"Modify Global Variable\((\w+), Append To Array, Vector\((.*)\)\)$",line)
+        if m:
+            src.append("    "*depth + "G.%s.append((%s))" % m.groups())
+            continue
+        if line.startswith("If("):
+            src.append("    "*depth + "if %s:" % line[2:])
+            depth += 1
+            continue
+        if line.startswith("Wait("):
+            src.append("    "*depth + "pass")
+            continue
+        src.append("    "*depth + line)
+    return "\n".join(src)
+
+class Globals:
+    pass
+
+def runRule(code,times):
+    G = Globals()
+    G.enemTime = times
+    G.enemPos = []
+    exec(code,{"G": G})
+    return G.enemPos
+
+@pytest.mark.parametrize("seed",random.Random(1).sample(range(65536),40))
+def test_rule_matches_walkPositions(seed):
+    code = compile(translate(renderWalkRule(seed)),"ENEMY POSITIONS","exec")
+    rng = random.Random(seed)
+    for _ in range(5):
+        # songs of every length, mostly short gaps so the walk reaches its limits
+        times = song(rng,rng.randint(1,400))
+        assert runRule(code,times) == walkPositions(times,seed)
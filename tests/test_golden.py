@@ -0,0 +1,23 @@
+import json
+import os
+
+import pytest
+
+from golden import GOLDEN_DIR, ROOT, corpus, runOne
+
+# Outputs recorded from the original scripts (golden.py record --baseline d62bd36)
+with open(os.path.join(GOLDEN_DIR,"manifest.json")) as f:
+    MANIFEST = json.load(f)
+
+
+@pytest.mark.parametrize("script,midi_dir,name,outputs",[pytest.param(*c,id=c[1] + "/" + c[2]) for c in corpus()])
+def test_matches_golden(script,midi_dir,name,outputs):
+    rc,_,files = runOne(os.path.join(ROOT,"Source"),script,midi_dir,name,outputs)
+    assert rc == MANIFEST["files"][midi_dir + "/" + name]["rc"]
+    for out in outputs:
+        path = os.path.join(GOLDEN_DIR,midi_dir,name,out)
+        want = None
+        if os.path.exists(path):
+            with open(path,"rb") as f:
+                want = f.read()
+        assert files[out] == want,out
@@ -0,0 +1,51 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import getSongNotes
+from analyze import predict
+from library import connect, scanMidi, search, update
+
+
+@pytest.mark.parametrize("name",["Dearly_Beloved_Piano_Collections_Kingdom_Hearts.mid","I_REALLY_WANT_TO_STAY_AT_YOUR_HOUSE.mid"])
+def test_scan_matches_predict(name,mids):
+    info = predict(mids.load(name).notes)
+    row = scanMidi(mids.path(name))
+    assert (row["time_q"],row["pos_q"],row["enemies"],row["lines"]) == (info["timeQ"],info["posQ"],info["enemTime"],info["lines"])
+
+def test_fits_skips_songs_that_crash(monkeypatch,tmp_path,mids):
+    # I_REALLY_WANT_TO_STAY_AT_YOUR_HOUSE is under the limits but ends with a tempo row
+    monkeypatch.chdir(tmp_path)
+    os.symlink(mids.path(),"mids")
+    db = connect("library.db")
+    update(db,("mids",))
+    names = [row["name"] for row in search(db,"STAY_AT")]
+    fits = [row["name"] for row in search(db,"STAY_AT",fits=True)]
+    db.close()
+    assert (names,fits) == (["I_REALLY_WANT_TO_STAY_AT_YOUR_HOUSE.mid"],[])
+
+def test_file_choice_without_match(monkeypatch,tmp_path,mids):
+    monkeypatch.chdir(tmp_path)
+    os.symlink(mids.path(),"mids")
+    answers = iter(["no such song", "1"])
+    monkeypatch.setattr("builtins.input",lambda prompt: next(answers))
+    with contextlib.redirect_stdout(io.StringIO()):
+        name = getSongNotes.get_file_choice()
+    assert name.endswith(".mid")
+
+def test_file_choice_empty_folder(monkeypatch,tmp_path):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("mids")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert getSongNotes.get_file_choice() is None
+
+def test_scan_reads_title_tracks_and_tempos(tmp_path):
+    first = b"\x00\xff\x03\x05Piano\x00\xff\x51\x03\x07\xa1\x20\x00\x90\x3c\x40\x60\xff\x51\x03\x0f\x42\x40\x00\x80\x3c\x00\x00\xff\x2f\x00"
+    second = b"\x00\xff\x03\x04Bass\x00\x90\x30\x40\x00\x90\x34\x40\x60\x80\x30\x00\x00\xff\x2f\x00"
+    path = tmp_path / "two.mid"
+    path.write_bytes(b"MThd\x00\x00\x00\x06\x00\x01\x00\x02\x00\x60" +
+                     b"".join(b"MTrk" + len(t).to_bytes(4,"big") + t for t in (first,second)))
+    row = scanMidi(str(path))
+    assert (row["title"],row["tracks"],row["notes"],row["tempo_min"],row["tempo_max"]) == ("Piano",2,3,60,120)
@@ -0,0 +1,20 @@
+import pytest
+
+from safeMidi import Limits, MidiError
+
+NAME = "Fr_Elise.mid"
+
+
+@pytest.mark.parametrize("window",[(16.0,48.0,False),(0.0,None,False),(5.1,20.1,True)])
+def test_safe_window_matches_window(window,mids):
+    plain = mids.load(NAME,window=window)
+    safe = mids.load(NAME,window=window,limits=Limits())
+    assert plain.success and safe.success
+    # seconds go through the rounded bpm of the tempo events, so the start moves by microseconds
+    assert [e.text() for e in safe.notes] == [e.text() for e in plain.notes]
+    assert [e.time for e in safe.notes] == pytest.approx([e.time for e in plain.notes],abs=1e-3)
+
+def test_safe_window_keeps_limits(mids):
+    midi = mids.load(NAME,window=(16.0,48.0,False),limits=Limits(maxBytes=100))
+    assert not midi.success
+    assert isinstance(midi.error,MidiError)
@@ -0,0 +1,13 @@
+from phrases import EXPAND_RULE, compress, renderPhrases
+
+
+def test_expand_sets_ready_flag_last():
+    actions = EXPAND_RULE[EXPAND_RULE.index("actions"):]
+    assert actions.index("Global.phraseReady = False") < actions.index("For Global Variable(phraseI")
+    assert actions.rindex("End;") < actions.index("Global.phraseReady = True")
+
+def test_expand_reproduces_the_song():
+    tokens = [("%2.4f" % (k % 3),"qwe"[k % 3]) for k in range(40)]
+    song = compress(tokens)
+    assert song.expand() == tokens
+    assert renderPhrases(song).endswith(EXPAND_RULE)
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINE = os.path.join(ROOT,"Source","pipeline.py")
+MIDI = os.path.join(ROOT,"mids","Fr_Elise.mid")
+
+
+def run(*args):
+    return subprocess.run([sys.executable,PIPELINE] + list(args),capture_output=True,text=True).returncode
+
+def test_bad_arguments_write_manifest(tmp_path):
+    manifest = tmp_path / "out" / "m.json"
+    assert run(MIDI,"--skyline","--manifest",str(manifest)) == 2
+    info = json.loads(manifest.read_text())
+    assert info["rc"] == 2
+    assert "--skyline needs --bots" in info["error"]
+
+def test_unknown_option_writes_manifest(tmp_path):
+    manifest = tmp_path / "m.json"
+    assert run(MIDI,"--manifest",str(manifest),"--no-such-option") == 2
+    assert json.loads(manifest.read_text())["rc"] == 2
+
+def test_failed_delivery_moves_nothing(tmp_path):
+    # the second destination's folder is a file, so staging it fails after the first one is staged
+    (tmp_path / "blocked").write_text("")
+    first = tmp_path / "OW-Song.txt"
+    manifest = tmp_path / "m.json"
+    assert run(MIDI,"--emit","workshop=" + str(first),"--emit","json=" + str(tmp_path / "blocked" / "song.json"),
+               "--manifest",str(manifest)) == 1
+    assert not first.exists()
+    assert sorted(os.listdir(tmp_path)) == ["blocked","m.json"]
+    assert json.loads(manifest.read_text())["rc"] == 1
@@ -0,0 +1,24 @@
+import contextlib
+import io
+
+from durations import holdsByTime
+from noteColumns import NoteColumns
+from quantize import quantizeMidi
+
+
+def quantizedHolds(mids,**options):
+    midi = mids.load("Fr_Elise.mid",keepEvents=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = max(holdsByTime(NoteColumns.fromMidi(midi)).values())
+        quantizeMidi(midi,**options)
+    return before,holdsByTime(NoteColumns.fromMidi(midi))
+
+def test_short_notes_still_close_after_snapping(mids):
+    # key 67 at beat 66.5 has its onset and release snapped to the same 1/4 beat
+    before,holds = quantizedHolds(mids,subdivision=4)
+    assert max(holds.values()) < before + 1.0
+    assert holds[66.5] > 0
+
+def test_grid_snapping_keeps_note_lengths(mids):
+    before,holds = quantizedHolds(mids)
+    assert max(holds.values()) < before + 1.0
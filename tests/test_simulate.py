@@ -0,0 +1,45 @@
+from phrases import compress, renderPhrases
+from simulate import fireTicks, readArrays, simulate, songTracks
+from songPack import SongPack, render
+
+
+def song(n,shift=0):
+    # (time text, chord) tokens with repeats for the phrase and pack tables to share
+    return [("%2.4f" % ((k + shift) % 4 * 0.125),"qwerty"[:(k + shift) % 3 + 1]) for k in range(n)]
+
+def test_fireTicks_rounds_up_to_the_next_tick():
+    # 0.1 + 0.2 s is 18.000000000000004 ticks in floats and still fires on tick 18,
+    # 0.0167 s just misses tick 1
+    assert fireTicks(["0.1000","0.2000","0.0000"]) == [6,18,18]
+    assert fireTicks(["0.0167"]) == [2]
+    assert fireTicks(["0.0166"]) == [1]
+
+def test_peak_and_burst():
+    info = simulate(["0","0","1"],[2,3,1],["0","0.5"],life=1.0)
+    assert info["keys"] == 6 and info["spawns"] == 2
+    assert info["maxKeys"] == 5
+    assert info["peakLive"] == (2,30)
+    assert info["burst"] == (6,0)
+    assert info["burstSecond"] == (7,0)
+    assert info["ticks"] == 91
+
+def test_holds_keep_enemies_alive():
+    info = simulate(enemies=["0","0.5"],holds=["2.0000","0.0000"],life=1.0)
+    assert [live for tick,_,_,live in info["rows"]] == [1,2,1,0]
+
+def test_phrases_expand_like_PhraseSong():
+    tokens = song(60)
+    phrased = compress(tokens)
+    (label,times,notes), = songTracks(readArrays(renderPhrases(phrased)))
+    assert times == [t for t,_ in phrased.expand()]
+    assert notes == [len(c) for _,c in phrased.expand()]
+
+def test_pack_expands_like_SongPack():
+    pack = SongPack()
+    for k in range(3):
+        pack.add("song%d" % k,song(30 + k*7,k))
+    tracks = songTracks(readArrays(render(pack)))
+    assert len(tracks) == 3
+    for k,(label,times,notes) in enumerate(tracks):
+        assert times == [t for t,_ in pack.expand(k)]
+        assert notes == [len(c) for _,c in pack.expand(k)]
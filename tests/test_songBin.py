@@ -0,0 +1,34 @@
+import pytest
+
+from noteEvents import Chord, NoteEvent, ReleaseEvent, TempoEvent
+from songBin import MAX_LENGTH, encode, readSong, writeSong
+
+
+def test_round_trip(tmp_path):
+    notes = [TempoEvent(0.0,120),NoteEvent(0.0,"1"),Chord(1.0,"qwe"),ReleaseEvent(2.0,"1")]
+    path = str(tmp_path / "song.owsb")
+    writeSong(path,notes,1.5)
+    speed,back = readSong(path)
+    assert speed == 1.5
+    assert [(e.time,e.text()) for e in back] == [(e.time,e.text()) for e in notes]
+
+def test_chord_too_long():
+    with pytest.raises(ValueError):
+        encode([TempoEvent(0.0,120),Chord(0.0,"a" * (MAX_LENGTH + 1))])
+
+def test_tempo_too_large():
+    with pytest.raises(ValueError):
+        encode([TempoEvent(0.0,1 << 24)])
+
+def test_blob_too_large():
+    # one 63 byte chord per record, the 24 bit offset runs out after 16 MB
+    chord = Chord(0.0,"a" * MAX_LENGTH)
+    with pytest.raises(ValueError):
+        encode([chord] * ((1 << 24) // MAX_LENGTH + 2))
+
+def test_processFile_empty_song(tmp_path):
+    import getSongNotes
+    path = str(tmp_path / "song.owsb")
+    writeSong(path,[])
+    with pytest.raises(ValueError):
+        getSongNotes.processFile(path)
@@ -0,0 +1,32 @@
+from emitters import walk
+from phrases import songTokens
+from simulate import readArrays
+from songPack import SongPack, loadSong, render
+
+NAMES = ["Fr_Elise.mid","Sweden_Minecraft.mid","Wet_Hands_Minecraft.mid"]
+
+
+def tokens(midi):
+    chords = [c for _,c in walk(midi.notes) if c is not None]
+    return songTokens([c[0] for c in chords],[c[1] for c in chords])
+
+def test_pack_round_trips_songTokens(mids):
+    pack = SongPack()
+    songs = [tokens(mids.load(name)) for name in NAMES]
+    for name,t in zip(NAMES,songs):
+        pack.add(name,t)
+    arrays = readArrays(render(pack))
+    k = arrays["packChords"]
+    for song,t in enumerate(songs):
+        assert pack.expand(song) == t
+        # what PACK LOAD rebuilds from the written arrays
+        start = int(arrays["packSongStart"][song])
+        events = [int(e) for e in arrays["packEvent"][start:start + int(arrays["packSongLen"][song])]]
+        assert [arrays["packTime"][e // k] for e in events] == [time for time,_ in t]
+        assert [int(arrays["packChordNotes"][e % k]) for e in events] == [len(c) for _,c in t]
+
+def test_song_without_tempo_is_skipped(tmp_path):
+    track = b"\x00\x90\x3c\x40\x60\x80\x3c\x00\x00\xff\x2f\x00"
+    path = tmp_path / "notempo.mid"
+    path.write_bytes(b"MThd\x00\x00\x00\x06\x00\x00\x00\x01\x00\x60" + b"MTrk" + len(track).to_bytes(4,"big") + track)
+    assert loadSong(str(path)) == (str(path),None)
@@ -0,0 +1,31 @@
+import math
+import random
+
+import pytest
+
+from spawnPlanner import SpawnPlanner, planPositions
+
+
+@pytest.mark.parametrize("seed,distance",[(1,1.5),(2,3.0),(3,6.0)])
+def test_live_enemies_stay_apart(seed,distance):
+    # dense song, 30 enemies a second with random lives, checked against a brute force live set
+    rng = random.Random(seed)
+    gaps = [rng.expovariate(30.0) for _ in range(1000)]
+    lives = [rng.uniform(0.5,2.0) for _ in gaps]
+    planner = SpawnPlanner(distance,rng=random.Random(seed))
+    positions = planPositions(gaps,planner,lives=lives)
+
+    live = []   # (expiry, position)
+    now = 0.0
+    crowded = 0
+    for gap,life,pos in zip(gaps,lives,positions):
+        now += gap
+        live = [(end,p) for end,p in live if end > now]
+        if min((math.dist(pos,p) for _,p in live),default=distance) < distance:
+            crowded += 1
+        live.append((now + life,pos))
+    assert crowded == planner.crowded
+    assert crowded < len(gaps)
+    # expired enemies are gone from the hash, the live ones are all there
+    planner.expire(now)
+    assert sorted(p for cell in planner.cells.values() for p in cell) == sorted(p for end,p in live if end > now)
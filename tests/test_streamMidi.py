@@ -0,0 +1,43 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from streamMidi import makeMidi, mergeChords, streamEvents
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = [(d,n) for d in ("mids","trebleMids") for n in sorted(os.listdir(os.path.join(ROOT,d))) if n.endswith(".mid")]
+
+
+def rows(notes):
+    return [(e.time,type(e).__name__,e.text()) for e in notes]
+
+def streamed(f,block=None):
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        notes = list(mergeChords(streamEvents(f,block)))
+    return notes,out.getvalue()
+
+@pytest.mark.parametrize("midi_dir,name",CORPUS,ids=[d + "/" + n for d,n in CORPUS])
+def test_stream_matches_MidiFile(midi_dir,name,mids):
+    midi = mids.load(name,folder=midi_dir)
+    with open(mids.path(name,folder=midi_dir),"rb") as f:
+        assert rows(streamed(f)[0]) == rows(midi.notes)
+        # small blocks, so events straddle the buffer refills
+        f.seek(0)
+        assert rows(streamed(f,block=7)[0]) == rows(midi.notes)
+
+def test_truncated_track(tmp_path):
+    path = str(tmp_path / "long.mid")
+    makeMidi(path,200)
+    with open(path,"rb") as f:
+        full = rows(streamed(f)[0])
+        data = f.seek(0) or f.read()
+    cut = tmp_path / "cut.mid"
+    # end of track (8 bytes) and two steps (7 each) gone plus one byte, the last press loses its velocity
+    cut.write_bytes(data[:-23])
+    with open(cut,"rb") as f:
+        notes,log = streamed(f)
+    assert "ends early" in log
+    assert 0 < len(notes) < len(full)
+    assert rows(notes) == full[:len(notes)]
@@ -0,0 +1,28 @@
+import pytest
+
+import noteColumns
+import variants
+from noteColumns import NoteColumns
+from variants import Variant, batch
+
+SPECS = ["easy","normal","hard","fast:speed=1.25,nps=6","slow:speed=0.8,nps=3,chord=2","up:transpose=12,nps=7"]
+
+
+def rows(columns,vs):
+    return [([float(x) for x in t],[int(x) for x in s],[bool(x) for x in o],[float(x) for x in tt])
+            for t,s,o,tt in batch(columns,vs)]
+
+@pytest.mark.skipif(noteColumns.np is None,reason="needs numpy")
+@pytest.mark.parametrize("name",["Fr_Elise.mid","Through_the_Fire_and_Flames.mid"])
+def test_numpy_and_python_agree(name,monkeypatch,mids):
+    midi = mids.load(name,keepEvents=True)
+    vs = [Variant.parse(spec) for spec in SPECS]
+    fast = rows(NoteColumns.fromMidi(midi),vs)
+    monkeypatch.setattr(noteColumns,"np",None)
+    monkeypatch.setattr(variants,"np",None)
+    assert rows(NoteColumns.fromMidi(midi),vs) == fast
+
+@pytest.mark.parametrize("spec",["slow:speed=0","back:speed=-1","odd:nps=-2"])
+def test_bad_variants(spec):
+    with pytest.raises(ValueError):
+        Variant.parse(spec)
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from workshopWriter import buildWorkshop, writeAtomic
+
+
+def test_missing_part_is_an_error(tmp_path):
+    template = tmp_path / "template.txt"
+    template.write_text("a\nMARK\nb\n")
+    with pytest.raises(FileNotFoundError):
+        buildWorkshop(str(template),str(tmp_path / "workshop.txt"),[str(tmp_path / "OW-Enem.txt")],"MARK")
+    assert not (tmp_path / "workshop.txt").exists()
+
+def test_parts_spliced_at_marker(tmp_path):
+    template = tmp_path / "template.txt"
+    template.write_text("a\nMARK\nb\n")
+    part = tmp_path / "OW-Song.txt"
+    part.write_text("rules\n")
+    buildWorkshop(str(template),str(tmp_path / "workshop.txt"),[str(part)],"MARK")
+    assert (tmp_path / "workshop.txt").read_text() == "a\nrules\nb\n"
+
+def test_writeAtomic_uses_platform_newline(tmp_path):
+    path = tmp_path / "out.txt"
+    writeAtomic(str(path),"a\nb\n")
+    assert path.read_bytes() == ("a" + os.linesep + "b" + os.linesep).encode()
+
+@pytest.mark.skipif(os.name != "posix",reason="file modes")
+def test_outputs_get_the_open_mode(tmp_path):
+    from emitters import Sheet
+    plain = tmp_path / "plain.txt"
+    with open(plain,"w") as f:
+        f.write("x")
+    writeAtomic(str(tmp_path / "atomic.txt"),"x")
+    sheet = Sheet(str(tmp_path / "stream.txt"),stream=True)
+    sheet.save()
+    mode = os.stat(plain).st_mode & 0o777
+    assert os.stat(tmp_path / "atomic.txt").st_mode & 0o777 == mode
+    assert os.stat(tmp_path / "stream.txt").st_mode & 0o777 == mode